@@ -5,21 +5,349 @@ Updated for new OpenAI SDK and proper error handling
 """
 
 import asyncio
-from typing import Dict, Any, Optional
-from datetime import datetime, timezone
+import copy
+import hashlib
+import random
+import re
+import time
+from collections import OrderedDict, deque
+from typing import AsyncIterator, Callable, Deque, Dict, Any, Optional, List, Set, Tuple
+from pydantic import create_model
 from core.config import settings
-from core.errors import AIServiceError
+from core.errors import AIServiceError, ValidationError
 import json
 
 try:
+    import httpx
+    import openai
     from openai import AsyncOpenAI
     OPENAI_AVAILABLE = True
+    RATE_LIMIT_ERRORS: Tuple[type, ...] = (openai.RateLimitError,)
+    TIMEOUT_ERRORS: Tuple[type, ...] = (openai.APITimeoutError, openai.APIConnectionError)
+    BAD_REQUEST_ERRORS: Tuple[type, ...] = (openai.BadRequestError,)
 except ImportError:
     OPENAI_AVAILABLE = False
+    RATE_LIMIT_ERRORS = ()
+    TIMEOUT_ERRORS = ()
+    BAD_REQUEST_ERRORS = ()
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+try:
+    import h2  # enables httpx HTTP/2 support
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+try:
+    import tiktoken
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    TIKTOKEN_AVAILABLE = False
+
+# Static instruction placed at the head of the system prompt for structured calls
+JSON_ONLY_INSTRUCTION = "IMPORTANT: Respond with valid JSON only. No explanations or additional text."
+
+# Full-jitter backoff parameters (seconds)
+RETRY_BACKOFF_BASE = 0.25
+RETRY_BACKOFF_CAP = 30.0
+
+# Durations in x-ratelimit-reset-* headers, e.g. "20ms", "1s", "6m0s"
+_DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def _parse_duration(value: Optional[str]) -> Optional[float]:
+    """Parse an OpenAI rate-limit reset duration into seconds"""
+    if not value:
+        return None
+    parts = _DURATION_RE.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in parts)
+
+
+def _retry_after_seconds(headers: Any) -> Optional[float]:
+    """Get the server-advised wait from rate-limit response headers"""
+    if not headers:
+        return None
+    
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except ValueError:
+        pass
+    
+    return _parse_duration(headers.get("x-ratelimit-reset-requests") or headers.get("x-ratelimit-reset-tokens"))
+
+def _json_dumps_bytes(obj: Any, sort_keys: bool = False) -> bytes:
+    """Serialize to compact UTF-8 JSON, using orjson when available"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(obj, default=str, option=orjson.OPT_SORT_KEYS if sort_keys else 0)
+    return json.dumps(obj, sort_keys=sort_keys, separators=(",", ":"), ensure_ascii=False, default=str).encode()
+
+
+def _json_dumps(obj: Any, sort_keys: bool = False) -> str:
+    """Serialize to a compact JSON string"""
+    return _json_dumps_bytes(obj, sort_keys).decode()
+
+
+def _json_loads(data: Any) -> Any:
+    """Parse JSON text or bytes, using orjson when available"""
+    return orjson.loads(data) if ORJSON_AVAILABLE else json.loads(data)
+
+
+# Pricing per 1M tokens (approximate)
+_PRICING = {
+    "gpt-4o": {"input": 0.005, "output": 0.015},
+    "gpt-4o-mini": {"input": 0.00015, "output": 0.0006},
+    "gpt-3.5-turbo": {"input": 0.0005, "output": 0.0015}
+}
+
+# Models that accept a response_format parameter
+_RESPONSE_FORMAT_MODELS = frozenset({"gpt-4o-mini", "gpt-4", "gpt-4-turbo", "gpt-4o"})
+
+# Provider prompt-cache routing keys, keyed by system prompt text
+_PROMPT_CACHE_KEYS: Dict[str, str] = {}
+_PROMPT_CACHE_KEYS_MAX = 1024
+
+
+def _prompt_cache_key(system_prompt: str) -> str:
+    """Stable short key for a system prompt, so requests sharing it hit the same cached prefix"""
+    key = _PROMPT_CACHE_KEYS.get(system_prompt)
+    if key is None:
+        if len(_PROMPT_CACHE_KEYS) >= _PROMPT_CACHE_KEYS_MAX:
+            _PROMPT_CACHE_KEYS.clear()
+        key = hashlib.blake2b(system_prompt.encode(), digest_size=8).hexdigest()
+        _PROMPT_CACHE_KEYS[system_prompt] = key
+    return key
+
+# JSON schema primitives supported by SDK-side structured output parsing
+_JSON_TYPE_MAP = {"string": str, "integer": int, "number": float, "boolean": bool}
+
+# Canonical schema text and digest keyed by object identity. Entries hold a reference to the
+# schema so its id can't be reused; schemas passed to the client are treated as immutable.
+_SCHEMA_TEXT_CACHE: Dict[int, Tuple[Any, str, str]] = {}
+_SCHEMA_TEXT_CACHE_MAX = 256
+
+# Schema used by generate_json_response when the caller doesn't supply one
+_DEFAULT_JSON_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "content": {"type": "string"},
+        "success": {"type": "boolean"}
+    },
+    "required": ["content", "success"]
+}
+
+
+def _schema_text(schema: Dict[str, Any]) -> Tuple[str, str]:
+    """Sorted-key JSON text and SHA-256 digest of a schema, serialized once per schema object"""
+    entry = _SCHEMA_TEXT_CACHE.get(id(schema))
+    if entry is None:
+        if len(_SCHEMA_TEXT_CACHE) >= _SCHEMA_TEXT_CACHE_MAX:
+            _SCHEMA_TEXT_CACHE.clear()
+        data = _json_dumps_bytes(schema, sort_keys=True)
+        entry = (schema, data.decode(), hashlib.sha256(data).hexdigest())
+        _SCHEMA_TEXT_CACHE[id(schema)] = entry
+    return entry[1], entry[2]
+
+# Name sent in json_schema response formats; the API rejects formats without one
+_RESPONSE_FORMAT_NAME = "structured_response"
+
+
+def _json_schema_format(schema: Dict[str, Any]) -> Dict[str, Any]:
+    """Wrap a JSON schema in the json_schema response format the chat completions API expects"""
+    # Caller schemas mark optional fields, which strict mode doesn't allow
+    return {
+        "type": "json_schema",
+        "json_schema": {"name": _RESPONSE_FORMAT_NAME, "schema": schema, "strict": False}
+    }
+
+
+def _response_schema(response_format: Dict[str, Any]) -> Dict[str, Any]:
+    """Get the bare JSON schema from a response format, wrapped or not"""
+    schema = response_format.get("json_schema") or response_format
+    return schema.get("schema", schema)
+
+
+def _normalize_response_format(response_format: Dict[str, Any]) -> Dict[str, Any]:
+    """Add the name/schema wrapper to json_schema formats that were passed a bare schema"""
+    if response_format.get("type") != "json_schema":
+        return response_format
+    json_schema = response_format.get("json_schema") or {}
+    if "name" in json_schema and "schema" in json_schema:
+        return response_format
+    return _json_schema_format(json_schema)
+
+# Pydantic models compiled from response schemas, keyed by schema hash (None = unsupported)
+_PARSED_MODEL_CACHE: Dict[str, Any] = {}
+
+
+def _schema_field_type(schema: Dict[str, Any], name: str) -> Any:
+    """Map a JSON schema node to a Python type for a Pydantic field"""
+    schema_type = schema.get("type")
+    if schema_type == "object":
+        return _schema_to_model(schema, name)
+    if schema_type == "array":
+        return List[_schema_field_type(schema.get("items", {}), f"{name}Item")]
+    if schema_type in _JSON_TYPE_MAP:
+        return _JSON_TYPE_MAP[schema_type]
+    raise ValueError(f"Unsupported schema type for {name}: {schema_type}")
+
+
+def _schema_to_model(schema: Dict[str, Any], name: str) -> Any:
+    """Build a Pydantic model from an object JSON schema"""
+    properties = schema.get("properties")
+    if not properties:
+        # Free-form objects can't be expressed as strict structured outputs
+        raise ValueError(f"Object {name} has no properties")
+    
+    required = set(schema.get("required", []))
+    fields = {}
+    for prop, prop_schema in properties.items():
+        field_type = _schema_field_type(prop_schema, f"{name}_{prop}")
+        fields[prop] = (field_type, ...) if prop in required else (Optional[field_type], None)
+    return create_model(name, **fields)
+
+
+def _parsed_response_model(response_format: Optional[Dict[str, Any]]) -> Any:
+    """Get the cached Pydantic model for a json_schema response format, if one can be built"""
+    if not response_format or response_format.get("type") != "json_schema":
+        return None
+    
+    schema = _response_schema(response_format)
+    _, key = _schema_text(schema)
+    if key not in _PARSED_MODEL_CACHE:
+        try:
+            _PARSED_MODEL_CACHE[key] = _schema_to_model(schema, "StructuredResponse")
+        except Exception:
+            _PARSED_MODEL_CACHE[key] = None
+    return _PARSED_MODEL_CACHE[key]
+
+
+# Demo-mode payloads, serialized once at import
+_MOCK_STRATEGY = _json_dumps({
+    "campaign_name": "New Marketing Campaign",
+    "duration_days": 30,
+    "main_themes": ["Brand Awareness", "Product Launch", "Customer Engagement"],
+    "weekly_schedule": {
+        "week_1": {"posts": 3, "theme": "Brand Awareness"},
+        "week_2": {"posts": 4, "theme": "Product Features"},
+        "week_3": {"posts": 3, "theme": "Customer Stories"},
+        "week_4": {"posts": 4, "theme": "Call to Action"}
+    },
+    "kpis": {
+        "target_reach": 10000,
+        "target_engagement_rate": 3.5,
+        "target_conversions": 100
+    }
+})
+
+_MOCK_CONTENT = _json_dumps({
+    "content": "🚀 Revolutionize your business with AI! Our cutting-edge solutions help you automate processes, boost efficiency, and drive growth. Ready to transform your future? #AI #Innovation #BusinessGrowth",
+    "hashtags": ["#AI", "#Innovation", "#BusinessGrowth", "#Productivity"],
+    "platform": "instagram",
+    "content_type": "post"
+})
+
+# Case-insensitive keyword scans that pick a demo payload without lowercasing the prompt
+_MOCK_STRATEGY_RE = re.compile(r"strategy|campaign", re.IGNORECASE)
+_MOCK_CONTENT_RE = re.compile(r"content", re.IGNORECASE)
+
+
+def _usage_dict(usage: Any) -> Dict[str, int]:
+    """Flatten an SDK usage object, including prompt tokens served from the provider cache"""
+    details = getattr(usage, "prompt_tokens_details", None)
+    return {
+        "prompt_tokens": usage.prompt_tokens,
+        "completion_tokens": usage.completion_tokens,
+        "total_tokens": usage.total_tokens,
+        "cached_tokens": getattr(details, "cached_tokens", None) or 0
+    }
+
+
+# Tokenizers cached per model name (None = tokenizer unavailable, use the estimate)
+_ENCODERS: Dict[str, Any] = {}
+
+
+def _load_encoder(model: str) -> Any:
+    """Load the model's tokenizer, or None if it can't be loaded"""
+    # tiktoken downloads its BPE files on first use, which fails without network access
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        return None
+
+
+def _count_tokens(text: str, model: str) -> int:
+    """Count tokens with the model's tokenizer, or estimate ~4 bytes per token without one"""
+    if not TIKTOKEN_AVAILABLE:
+        return len(text) >> 2
+    
+    if model not in _ENCODERS:
+        _ENCODERS[model] = _load_encoder(model)
+    encoder = _ENCODERS[model]
+    if encoder is None:
+        return len(text) >> 2
+    return len(encoder.encode(text))
+
+
+# Shared OpenAI clients keyed by API key hash, so every AIClient reuses one connection pool
+# (multiplexed over HTTP/2 when h2 is installed)
+_CLIENT_CACHE: Dict[str, Any] = {}
+
+
+def _get_shared_client(api_key: str, timeout: float) -> "AsyncOpenAI":
+    """Get or create the pooled OpenAI client for an API key"""
+    key = hashlib.sha256(api_key.encode()).hexdigest()
+    client = _CLIENT_CACHE.get(key)
+    if client is None:
+        http_client = httpx.AsyncClient(
+            http2=settings.AI_HTTP2 and HTTP2_AVAILABLE,
+            limits=httpx.Limits(
+                max_connections=settings.AI_POOL_SIZE,
+                max_keepalive_connections=settings.AI_POOL_SIZE // 2
+            ),
+            timeout=timeout
+        )
+        client = AsyncOpenAI(api_key=api_key, http_client=http_client)
+        _CLIENT_CACHE[key] = client
+    return client
+
+
+async def close_shared_clients() -> None:
+    """Close pooled connections; await from the app's shutdown handler, on the loop that used them"""
+    clients = list(_CLIENT_CACHE.values())
+    _CLIENT_CACHE.clear()
+    for client in clients:
+        await client.close()
 
 class AIClient:
     """AI client for OpenAI API communication"""
     
+    # Rate-limit headroom reported by the API, shared across instances
+    _rate_limit_state: Dict[str, Optional[float]] = {
+        "remaining_requests": None,
+        "remaining_tokens": None,
+        "reset_at": None
+    }
+    
     def __init__(self):
         self.api_key = settings.OPENAI_API_KEY
         self.default_model = settings.DEFAULT_AI_MODEL
@@ -27,14 +355,52 @@ class AIClient:
         self.timeout = settings.AI_TIMEOUT_SECONDS
         self.max_retries = settings.AI_MAX_RETRIES
         self.client = None
+        self._available = bool(self.api_key) or bool(getattr(settings, "DEBUG", False))
+        
+        # Client-side throttling: concurrent request ceiling and tokens-per-minute window
+        self._sem = asyncio.Semaphore(settings.AI_MAX_CONCURRENT or 32)
+        self._max_tokens_per_min = settings.AI_MAX_TOKENS_PER_MIN
+        self._tokens_used_window: Deque[List[Any]] = deque()
+        
+        # Exact-match response cache for deterministic (low temperature) calls
+        self._cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._cache_max = settings.AI_RESPONSE_CACHE_SIZE
+        self._cache_max_temperature = settings.AI_CACHE_MAX_TEMPERATURE
+        self.cache_stats = {"hits": 0, "misses": 0, "semantic_hits": 0}
+        
+        # Semantic cache for near-duplicate prompts: a ring buffer of normalized embeddings whose
+        # slots also hold the (model, temperature, max_tokens) key and response
+        self._semantic_cache_max = max(settings.AI_SEMANTIC_CACHE_SIZE, 0)
+        self._semantic_vectors: Optional[Any] = None  # allocated on first store, once the dimension is known
+        self._semantic_key_ids: Optional[Any] = None
+        self._semantic_entries: List[Optional[Tuple[Tuple, Dict[str, Any]]]] = [None] * self._semantic_cache_max
+        self._semantic_key_index: Dict[Tuple, int] = {}
+        self._semantic_counts: Dict[Tuple, int] = {}
+        self._semantic_next = 0
+        self._semantic_filled = 0
+        self._semantic_tasks: Set[asyncio.Task] = set()
+        self._semantic_threshold = settings.AI_SEMANTIC_CACHE_THRESHOLD
+        self._semantic_max_temperature = settings.AI_SEMANTIC_CACHE_MAX_TEMPERATURE
+        self.embedding_model = settings.AI_EMBEDDING_MODEL
         
         # Initialize OpenAI client if API key is available
         if self.api_key and OPENAI_AVAILABLE:
-            self.client = AsyncOpenAI(api_key=self.api_key)
+            self.client = _get_shared_client(self.api_key, self.timeout)
         elif not OPENAI_AVAILABLE:
             print("Warning: OpenAI package not installed. Running in demo mode.")
         elif not self.api_key:
             print("Warning: No OpenAI API key provided. Running in demo mode.")
+        
+        # Status fields never change after construction
+        self._status = {
+            "status": "available" if self.client else "demo_mode",
+            "api_key_configured": bool(self.api_key),
+            "openai_available": OPENAI_AVAILABLE,
+            "default_model": self.default_model,
+            "fallback_model": self.fallback_model,
+            "max_retries": self.max_retries,
+            "timeout": self.timeout
+        }
     
     async def generate_response(
         self, 
@@ -43,84 +409,541 @@ class AIClient:
         max_tokens: Optional[int] = None,
         temperature: float = 0.7,
         system_prompt: Optional[str] = None,
-        response_format: Optional[Dict[str, Any]] = None
+        response_format: Optional[Dict[str, Any]] = None,
+        stream: bool = False,
+        on_token: Optional[Callable[[str], Any]] = None
     ) -> Dict[str, Any]:
-        """Generate AI response with retry logic"""
+        """Generate AI response with retry logic
+        
+        With stream=True the completion is streamed and each text delta is passed
+        to on_token as it arrives; the full response is still returned in the
+        usual shape once the stream ends. A stream that fails after emitting
+        tokens is not retried.
+        """
         model = model or self.default_model
+        stream_state = {"emitted": False}
+        
+        # Prepare messages
+        messages = self._build_messages(prompt, system_prompt)
+        
+        # Serve identical deterministic requests from the response cache
+        cache_key = self._cache_key(model, messages, temperature, max_tokens, response_format)
+        if cache_key is not None:
+            cached = self._cache.get(cache_key)
+            if cached is not None:
+                self._cache.move_to_end(cache_key)
+                self.cache_stats["hits"] += 1
+                # Copies, so callers mutating usage or parsed_content can't corrupt later hits
+                return {**copy.deepcopy(cached), "response_time_ms": 0, "cache": "hit"}
+            self.cache_stats["misses"] += 1
+        
+        # Fall back to the semantic cache for paraphrased prompts; the embedding round-trip
+        # is only made up front when there are entries it could match
+        semantic_text = None
+        query_embedding = None
+        if self._semantic_cacheable(temperature, response_format):
+            semantic_text = f"{system_prompt or ''}\n{prompt}"
+            semantic_key = (model, temperature, max_tokens)
+            if self._semantic_counts.get(semantic_key):
+                query_embedding = await self._embed(semantic_text)
+            cached = self._semantic_lookup(semantic_key, query_embedding)
+            if cached is not None:
+                self.cache_stats["semantic_hits"] += 1
+                return {**copy.deepcopy(cached), "response_time_ms": 0, "cache": "semantic_hit"}
         
         for attempt in range(self.max_retries):
+            # Retrying would duplicate tokens the caller already received
+            if stream_state["emitted"]:
+                raise AIServiceError("AI response stream interrupted after partial output")
+            
             try:
                 # Check if we're in demo mode
                 if not self.client:
                     return self._create_mock_response(prompt, model)
                 
-                # Prepare messages
-                messages = []
-                if system_prompt:
-                    messages.append({"role": "system", "content": system_prompt})
-                messages.append({"role": "user", "content": prompt})
-                
                 # Prepare request parameters
-                request_params = {
-                    "model": model,
-                    "messages": messages,
-                    "temperature": temperature,
-                }
+                request_params = self._build_request_params(
+                    model, messages, temperature, max_tokens, response_format
+                )
+                if stream:
+                    request_params["stream"] = True
+                    request_params["stream_options"] = {"include_usage": True}
                 
-                # Add max tokens if specified
-                if max_tokens:
-                    request_params["max_tokens"] = max_tokens
+                # Wait out an exhausted rate-limit window instead of provoking a 429
+                await self._wait_for_rate_limit_headroom()
                 
-                # Add response format for structured output (GPT-4 and newer)
-                if response_format and model in ["gpt-4o-mini", "gpt-4", "gpt-4-turbo"]:
-                    request_params["response_format"] = response_format
+                # Let the SDK parse json_schema outputs directly when the schema maps to a model;
+                # streamed JSON is parsed by the caller once the stream ends
+                parsed_model = None if stream else _parsed_response_model(request_params.get("response_format"))
                 
                 # Make API call
-                start_time = datetime.now(timezone.utc)
-                response = await self.client.chat.completions.create(**request_params)
-                end_time = datetime.now(timezone.utc)
-                
-                # Extract response data
-                content = response.choices[0].message.content
+                message = None
+                reservation = await self._reserve_token_budget(self._estimate_tokens(model, messages, max_tokens))
+                used_tokens = 0
+                try:
+                    async with self._sem:
+                        start_ns = time.perf_counter_ns()
+                        if parsed_model is not None:
+                            raw_response = await self.client.beta.chat.completions.with_raw_response.parse(
+                                **{**request_params, "response_format": parsed_model}
+                            )
+                        else:
+                            raw_response = await self.client.chat.completions.with_raw_response.create(**request_params)
+                        response = raw_response.parse()
+                    
+                        # Extract response data
+                        if stream:
+                            content, usage = await self._collect_stream(response, on_token, stream_state)
+                        else:
+                            message = response.choices[0].message
+                            content = message.content
+                            usage = _usage_dict(response.usage)
+                        end_ns = time.perf_counter_ns()
+                    used_tokens = usage["total_tokens"]
+                finally:
+                    # Settle the reservation with actual usage (none if the call failed)
+                    reservation[1] = used_tokens
+                self._record_rate_limit_headers(raw_response.headers)
                 
-                return {
+                result = {
                     "success": True,
                     "content": content,
                     "model": model,
-                    "usage": {
-                        "prompt_tokens": response.usage.prompt_tokens,
-                        "completion_tokens": response.usage.completion_tokens,
-                        "total_tokens": response.usage.total_tokens
-                    },
-                    "response_time_ms": int((end_time - start_time).total_seconds() * 1000),
+                    "usage": usage,
+                    "response_time_ms": (end_ns - start_ns) // 1_000_000,
                     "attempt": attempt + 1
                 }
+                # Drop unset optional fields; the schemas don't allow null in their place
+                if parsed_model is not None and getattr(message, "parsed", None) is not None:
+                    result["parsed_content"] = message.parsed.model_dump(exclude_none=True)
+                self._cache_store(cache_key, result)
+                if semantic_text is not None:
+                    self._semantic_store((model, temperature, max_tokens), semantic_text, query_embedding, result)
+                return result
                 
-            except Exception as e:
-                error_message = str(e)
+            except RATE_LIMIT_ERRORS as e:
+                if attempt == self.max_retries - 1:
+                    raise AIServiceError(f"Rate limit exceeded after {self.max_retries} attempts")
+                # Sleep exactly as long as the server advises, else jittered backoff
+                delay = _retry_after_seconds(getattr(getattr(e, "response", None), "headers", None))
+                if delay is None:
+                    delay = random.uniform(0, min(RETRY_BACKOFF_CAP, RETRY_BACKOFF_BASE * (2 ** attempt)))
+                await asyncio.sleep(delay)
+                continue
                 
-                # Handle rate limits
-                if "rate limit" in error_message.lower():
-                    if attempt == self.max_retries - 1:
-                        raise AIServiceError(f"Rate limit exceeded after {self.max_retries} attempts")
-                    await asyncio.sleep(2 ** attempt)  # Exponential backoff
-                    continue
-                    
-                # Handle timeouts
-                elif "timeout" in error_message.lower():
-                    if attempt == self.max_retries - 1:
-                        raise AIServiceError(f"Request timeout after {self.max_retries} attempts")
-                    await asyncio.sleep(1)
-                    continue
+            except TIMEOUT_ERRORS:
+                # Timeouts and dropped connections are transient; retry with jitter
+                if attempt == self.max_retries - 1:
+                    raise AIServiceError(f"Request timeout after {self.max_retries} attempts")
+                await asyncio.sleep(random.uniform(0.1, 0.5 * (2 ** attempt)))
+                continue
                 
-                # For other errors, try fallback model on last attempt
-                elif attempt == self.max_retries - 1 and model != self.fallback_model:
+            except BAD_REQUEST_ERRORS as e:
+                # The same request will be rejected again; fail immediately
+                raise AIServiceError(f"AI API rejected request: {str(e)}")
+                
+            except ValidationError:
+                # A stream consumer rejected the partial output; stop generating
+                raise
+                
+            except Exception as e:
+                # For other errors, retry once more on the fallback model
+                if attempt < self.max_retries - 1 and model != self.fallback_model:
                     model = self.fallback_model
+                    # Cache the fallback's output under its own model, not the requested one
+                    cache_key = self._cache_key(model, messages, temperature, max_tokens, response_format)
                     continue
-                    
-                else:
-                    raise AIServiceError(f"AI API error: {error_message}")
+                raise AIServiceError(f"AI API error: {str(e)}")
+        
+        raise AIServiceError(f"AI request failed after {self.max_retries} attempts")
+    
+    
+    async def stream_response(
+        self,
+        prompt: str,
+        model: Optional[str] = None,
+        max_tokens: Optional[int] = None,
+        temperature: float = 0.7,
+        system_prompt: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """Yield response text as it is generated"""
+        queue: asyncio.Queue = asyncio.Queue()
+        done = object()
+        
+        async def produce() -> Dict[str, Any]:
+            try:
+                return await self.generate_response(
+                    prompt=prompt,
+                    model=model,
+                    max_tokens=max_tokens,
+                    temperature=temperature,
+                    system_prompt=system_prompt,
+                    stream=True,
+                    on_token=queue.put_nowait
+                )
+            finally:
+                queue.put_nowait(done)
+        
+        task = asyncio.create_task(produce())
+        streamed = False
+        try:
+            while True:
+                token = await queue.get()
+                if token is done:
+                    break
+                streamed = True
+                yield token
+            
+            # Cached and demo-mode responses arrive whole rather than as deltas
+            result = await task
+            if not streamed and result.get("content"):
+                yield result["content"]
+        finally:
+            if not task.done():
+                task.cancel()
+    
+    async def _collect_stream(
+        self,
+        stream: Any,
+        on_token: Optional[Callable[[str], Any]],
+        stream_state: Dict[str, bool]
+    ) -> Tuple[str, Dict[str, int]]:
+        """Consume a streamed completion, forwarding deltas and accumulating content and usage"""
+        parts: List[str] = []
+        usage = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0, "cached_tokens": 0}
+        
+        # Close the stream even when on_token aborts it or the caller is cancelled,
+        # so the pooled connection goes back to the pool right away
+        try:
+            async for chunk in stream:
+                if chunk.choices:
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        parts.append(delta)
+                        if on_token is not None:
+                            stream_state["emitted"] = True
+                            callback_result = on_token(delta)
+                            if asyncio.iscoroutine(callback_result):
+                                await callback_result
+                
+                # The final chunk carries usage when include_usage is requested
+                if chunk.usage is not None:
+                    usage = _usage_dict(chunk.usage)
+        finally:
+            await stream.close()
+        
+        return "".join(parts), usage
+    
+    async def generate_batch(
+        self,
+        requests: List[Dict[str, Any]],
+        poll_interval: float = 10
+    ) -> List[Dict[str, Any]]:
+        """Generate many responses through the OpenAI Batch API
+        
+        Intended for bulk, non-latency-sensitive jobs: batches are billed at a
+        discount but may take up to 24 hours. Each request accepts the same keys
+        as generate_response (prompt, model, max_tokens, temperature,
+        system_prompt, response_format). Results are returned in input order.
+        """
+        if not requests:
+            return []
+        
+        # Demo mode has no batch endpoint; answer each request locally
+        if not self.client:
+            return [
+                self._create_mock_response(request["prompt"], request.get("model") or self.default_model)
+                for request in requests
+            ]
+        
+        try:
+            # Serialize one JSONL line per request
+            lines = []
+            for i, request in enumerate(requests):
+                model = request.get("model") or self.default_model
+                messages = self._build_messages(request["prompt"], request.get("system_prompt"))
+                body = self._build_request_params(
+                    model,
+                    messages,
+                    request.get("temperature", 0.7),
+                    request.get("max_tokens"),
+                    request.get("response_format")
+                )
+                # Batch bodies are raw JSON, so SDK extra_body fields go top-level
+                body.update(body.pop("extra_body", {}))
+                lines.append(_json_dumps_bytes({
+                    "custom_id": f"req-{i}",
+                    "method": "POST",
+                    "url": "/v1/chat/completions",
+                    "body": body
+                }))
+            
+            # Upload input file and start the batch
+            start_ns = time.perf_counter_ns()
+            input_file = await self.client.files.create(
+                file=("batch.jsonl", b"\n".join(lines)),
+                purpose="batch"
+            )
+            batch = await self.client.batches.create(
+                input_file_id=input_file.id,
+                endpoint="/v1/chat/completions",
+                completion_window="24h"
+            )
+            
+            # Poll until the batch reaches a terminal state
+            while batch.status not in ("completed", "failed", "expired", "cancelled"):
+                await asyncio.sleep(poll_interval)
+                batch = await self.client.batches.retrieve(batch.id)
+            
+            if batch.status != "completed" or not batch.output_file_id:
+                raise AIServiceError(f"Batch {batch.id} ended with status: {batch.status}")
+            
+            output = await self.client.files.content(batch.output_file_id)
+            elapsed_ms = (time.perf_counter_ns() - start_ns) // 1_000_000
+            
+        except AIServiceError:
+            raise
+        except Exception as e:
+            raise AIServiceError(f"Batch generation failed: {str(e)}")
+        
+        # Align output lines back to inputs by custom_id
+        results_by_id: Dict[str, Dict[str, Any]] = {}
+        for line in output.text.splitlines():
+            if not line.strip():
+                continue
+            item = _json_loads(line)
+            response = item.get("response") or {}
+            body = response.get("body") or {}
+            
+            if response.get("status_code") == 200 and body.get("choices"):
+                usage = body.get("usage", {})
+                results_by_id[item["custom_id"]] = {
+                    "success": True,
+                    "content": body["choices"][0]["message"]["content"],
+                    "model": body.get("model"),
+                    "usage": {
+                        "prompt_tokens": usage.get("prompt_tokens", 0),
+                        "completion_tokens": usage.get("completion_tokens", 0),
+                        "total_tokens": usage.get("total_tokens", 0),
+                        "cached_tokens": (usage.get("prompt_tokens_details") or {}).get("cached_tokens", 0)
+                    },
+                    "response_time_ms": elapsed_ms,
+                    "attempt": 1,
+                    "batch_id": batch.id
+                }
+            else:
+                results_by_id[item["custom_id"]] = {
+                    "success": False,
+                    "error": item.get("error") or body.get("error") or "Batch request failed",
+                    "batch_id": batch.id
+                }
+        
+        return [
+            results_by_id.get(
+                f"req-{i}",
+                {"success": False, "error": "Missing from batch output", "batch_id": batch.id}
+            )
+            for i in range(len(requests))
+        ]
+    
+    def _build_messages(self, prompt: str, system_prompt: Optional[str]) -> List[Dict[str, str]]:
+        """Build chat messages with the system prompt first"""
+        messages = []
+        if system_prompt:
+            messages.append({"role": "system", "content": system_prompt})
+        messages.append({"role": "user", "content": prompt})
+        return messages
+    
+    def _build_request_params(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_tokens: Optional[int],
+        response_format: Optional[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """Build chat completion request parameters"""
+        request_params = {
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+        }
+        
+        # Add max tokens if specified
+        if max_tokens:
+            request_params["max_tokens"] = max_tokens
+        
+        # Add response format for structured output (GPT-4 and newer)
+        if response_format and model in _RESPONSE_FORMAT_MODELS:
+            request_params["response_format"] = _normalize_response_format(response_format)
+        
+        # Route requests sharing a system prompt to the same provider prompt cache
+        if messages and messages[0]["role"] == "system":
+            request_params["extra_body"] = {"prompt_cache_key": _prompt_cache_key(messages[0]["content"])}
+        
+        return request_params
+    
+    def _record_rate_limit_headers(self, headers: Any) -> None:
+        """Remember remaining request/token headroom from a successful response"""
+        state = AIClient._rate_limit_state
+        try:
+            remaining_requests = headers.get("x-ratelimit-remaining-requests")
+            remaining_tokens = headers.get("x-ratelimit-remaining-tokens")
+            state["remaining_requests"] = int(remaining_requests) if remaining_requests is not None else None
+            state["remaining_tokens"] = int(remaining_tokens) if remaining_tokens is not None else None
+        except (AttributeError, ValueError):
+            return
+        
+        reset = max(
+            _parse_duration(headers.get("x-ratelimit-reset-requests")) or 0.0,
+            _parse_duration(headers.get("x-ratelimit-reset-tokens")) or 0.0
+        )
+        state["reset_at"] = time.monotonic() + reset
+    
+    def _estimate_tokens(self, model: str, messages: List[Dict[str, str]], max_tokens: Optional[int]) -> int:
+        """Estimate the tokens a request will consume"""
+        return sum(_count_tokens(message["content"], model) for message in messages) + (max_tokens or 0)
+    
+    async def _reserve_token_budget(self, estimated_tokens: int) -> List[Any]:
+        """Sleep until the sliding one-minute window has room, then reserve the estimate in it
+        
+        Returns the [timestamp, tokens] window entry so the caller can replace the
+        estimate with actual usage. Reserving under the check keeps concurrent
+        callers from all passing against the same window.
+        """
+        window = self._tokens_used_window
+        while True:
+            now = time.monotonic()
+            while window and now - window[0][0] >= 60:
+                window.popleft()
+            
+            if not window or sum(tokens for _, tokens in window) + estimated_tokens <= self._max_tokens_per_min:
+                reservation = [now, estimated_tokens]
+                window.append(reservation)
+                return reservation
+            # Jitter so waiters don't all recheck on the same expiry
+            await asyncio.sleep(60 - (now - window[0][0]) + random.uniform(0, 0.25))
+    
+    async def _wait_for_rate_limit_headroom(self) -> None:
+        """Sleep until the rate-limit window resets if it is known to be exhausted"""
+        state = AIClient._rate_limit_state
+        if state["remaining_requests"] != 0 and state["remaining_tokens"] != 0:
+            return
+        
+        reset_at = state["reset_at"]
+        if reset_at is not None:
+            delay = reset_at - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        state["remaining_requests"] = state["remaining_tokens"] = None
+    
+    def _cache_key(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_tokens: Optional[int],
+        response_format: Optional[Dict[str, Any]]
+    ) -> Optional[str]:
+        """Build a cache key for a request, or None if the request is not cacheable"""
+        if temperature > self._cache_max_temperature or self._cache_max <= 0:
+            return None
+        
+        # Schemas are fingerprinted once rather than re-serialized into every key
+        schema_digest = None
+        if response_format:
+            _, schema_digest = _schema_text(_response_schema(response_format))
+        
+        payload = {
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "response_format": schema_digest
+        }
+        return hashlib.sha256(_json_dumps_bytes(payload, sort_keys=True)).hexdigest()
+    
+    def _cache_store(self, cache_key: Optional[str], result: Dict[str, Any]) -> None:
+        """Store a copy of a successful response, evicting the least recently used entry"""
+        if cache_key is None:
+            return
+        
+        self._cache[cache_key] = copy.deepcopy(result)
+        self._cache.move_to_end(cache_key)
+        if len(self._cache) > self._cache_max:
+            self._cache.popitem(last=False)
+    
+    def _semantic_cacheable(self, temperature: float, response_format: Optional[Dict[str, Any]]) -> bool:
+        """Check whether a request may be served from the semantic cache"""
+        return (
+            self.client is not None
+            and NUMPY_AVAILABLE
+            and self._semantic_cache_max > 0
+            and temperature <= self._semantic_max_temperature
+            and not response_format
+        )
+    
+    async def _embed(self, text: str) -> Optional[Any]:
+        """Get an L2-normalized embedding for text, or None if embedding fails"""
+        try:
+            response = await self.client.embeddings.create(model=self.embedding_model, input=text)
+            vector = np.asarray(response.data[0].embedding, dtype=np.float32)
+            norm = np.linalg.norm(vector)
+            return vector / norm if norm else None
+        except Exception:
+            return None
+    
+    def _semantic_lookup(self, key: Tuple, embedding: Optional[Any]) -> Optional[Dict[str, Any]]:
+        """Find the most similar cached response with the same model, temperature and max_tokens"""
+        if embedding is None or not self._semantic_counts.get(key):
+            return None
+        
+        filled = self._semantic_filled
+        scores = self._semantic_vectors[:filled] @ embedding
+        scores[self._semantic_key_ids[:filled] != self._semantic_key_index[key]] = -np.inf
+        best = int(scores.argmax())
+        
+        if scores[best] >= self._semantic_threshold:
+            return self._semantic_entries[best][1]
+        return None
+    
+    def _semantic_store(self, key: Tuple, text: str, embedding: Optional[Any], result: Dict[str, Any]) -> None:
+        """Store a copy of a response in the semantic cache, embedding its prompt in the background if needed"""
+        # Copied now, before the caller can mutate the result it was handed
+        result = copy.deepcopy(result)
+        if embedding is not None:
+            self._semantic_insert(key, embedding, result)
+            return
         
+        task = asyncio.ensure_future(self._embed_and_store(key, text, result))
+        self._semantic_tasks.add(task)
+        task.add_done_callback(self._semantic_tasks.discard)
+    
+    async def _embed_and_store(self, key: Tuple, text: str, result: Dict[str, Any]) -> None:
+        """Embed a prompt off the request path and cache its response"""
+        embedding = await self._embed(text)
+        if embedding is not None:
+            self._semantic_insert(key, embedding, result)
+    
+    def _semantic_insert(self, key: Tuple, embedding: Any, result: Dict[str, Any]) -> None:
+        """Write an entry into the next ring buffer slot, overwriting the oldest once full"""
+        if self._semantic_vectors is None:
+            self._semantic_vectors = np.zeros((self._semantic_cache_max, embedding.shape[0]), dtype=np.float32)
+            self._semantic_key_ids = np.full(self._semantic_cache_max, -1, dtype=np.int64)
+        
+        slot = self._semantic_next
+        evicted = self._semantic_entries[slot]
+        if evicted is not None:
+            self._semantic_counts[evicted[0]] -= 1
+        
+        key_id = self._semantic_key_index.setdefault(key, len(self._semantic_key_index))
+        self._semantic_vectors[slot] = embedding
+        self._semantic_key_ids[slot] = key_id
+        self._semantic_entries[slot] = (key, result)
+        self._semantic_counts[key] = self._semantic_counts.get(key, 0) + 1
+        
+        self._semantic_next = (slot + 1) % self._semantic_cache_max
+        self._semantic_filled = min(self._semantic_filled + 1, self._semantic_cache_max)
     
     async def generate_json_response(
         self,
@@ -128,24 +951,27 @@ class AIClient:
         model: Optional[str] = None,
         temperature: float = 0.3,
         system_prompt: Optional[str] = None,
-        schema: Optional[Dict[str, Any]] = None
+        schema: Optional[Dict[str, Any]] = None,
+        on_token: Optional[Callable[[str], Any]] = None
     ) -> Dict[str, Any]:
-        """Generate JSON response with schema validation"""
+        """Generate JSON response with schema validation
+        
+        The schema is serialized at the start of the system prompt so the static
+        prefix stays byte-identical across calls and is eligible for provider-side
+        prompt caching. Callers should keep request-specific data in `prompt`.
+        When on_token is given the response is streamed through it, so callers
+        can validate partial JSON as it arrives.
+        """
         try:
             # Prepare JSON schema
-            json_schema = schema or {
-                "type": "object",
-                "properties": {
-                    "content": {"type": "string"},
-                    "success": {"type": "boolean"}
-                },
-                "required": ["content", "success"]
-            }
+            json_schema = schema or _DEFAULT_JSON_SCHEMA
+            
+            response_format = _json_schema_format(json_schema)
             
-            response_format = {
-                "type": "json_schema",
-                "json_schema": json_schema
-            }
+            # Static schema text first, caller's system prompt after it
+            schema_text, _ = _schema_text(json_schema)
+            schema_prompt = f"Respond using this JSON schema:\n{schema_text}"
+            system_prompt = f"{schema_prompt}\n\n{system_prompt}" if system_prompt else schema_prompt
             
             # Generate response
             result = await self.generate_response(
@@ -153,15 +979,17 @@ class AIClient:
                 model=model,
                 temperature=temperature,
                 system_prompt=system_prompt,
-                response_format=response_format
+                response_format=response_format,
+                stream=on_token is not None,
+                on_token=on_token
             )
             
-            # Parse JSON response
-            if result["success"]:
+            # Parse JSON response (skipped when the SDK already parsed it)
+            if result["success"] and "parsed_content" not in result:
                 try:
                     content = result["content"]
                     if isinstance(content, str):
-                        parsed_content = json.loads(content)
+                        parsed_content = _json_loads(content)
                         return {
                             **result,
                             "parsed_content": parsed_content
@@ -173,7 +1001,7 @@ class AIClient:
             
             return result
             
-        except AIServiceError:
+        except (AIServiceError, ValidationError):
             raise
         except Exception as e:
             raise AIServiceError(f"Failed to generate JSON response: {str(e)}")
@@ -184,71 +1012,58 @@ class AIClient:
         model: Optional[str] = None,
         temperature: float = 0.3,
         system_prompt: Optional[str] = None,
-        schema: Optional[Dict[str, Any]] = None
+        schema: Optional[Dict[str, Any]] = None,
+        on_token: Optional[Callable[[str], Any]] = None
     ) -> Dict[str, Any]:
-        """Generate structured response with schema validation"""
+        """Generate structured response with schema validation
+        
+        The JSON formatting instruction is merged into the system prompt rather
+        than appended to the user prompt, keeping the volatile user content at
+        the tail of the request.
+        """
         try:
-            # Add JSON formatting instruction to prompt
-            json_prompt = f"""
-{prompt}
-
-IMPORTANT: Respond with valid JSON only. No explanations or additional text.
-"""
+            # Add JSON formatting instruction ahead of the caller's system prompt
+            json_system_prompt = (
+                f"{JSON_ONLY_INSTRUCTION}\n\n{system_prompt}" if system_prompt else JSON_ONLY_INSTRUCTION
+            )
             
             # Generate JSON response
             return await self.generate_json_response(
-                prompt=json_prompt,
+                prompt=prompt,
                 model=model,
                 temperature=temperature,
-                system_prompt=system_prompt,
-                schema=schema
+                system_prompt=json_system_prompt,
+                schema=schema,
+                on_token=on_token
             )
             
-        except AIServiceError:
+        except (AIServiceError, ValidationError):
             raise
         except Exception as e:
             raise AIServiceError(f"Failed to generate structured response: {str(e)}")
     
     def _create_mock_response(self, prompt: str, model: str) -> Dict[str, Any]:
         """Create mock response for demo mode"""
-        import uuid
-        
         # Simple mock response based on prompt content
-        if "strategy" in prompt.lower() or "campaign" in prompt.lower():
-            content = json.dumps({
-                "campaign_name": "New Marketing Campaign",
-                "duration_days": 30,
-                "main_themes": ["Brand Awareness", "Product Launch", "Customer Engagement"],
-                "weekly_schedule": {
-                    "week_1": {"posts": 3, "theme": "Brand Awareness"},
-                    "week_2": {"posts": 4, "theme": "Product Features"},
-                    "week_3": {"posts": 3, "theme": "Customer Stories"},
-                    "week_4": {"posts": 4, "theme": "Call to Action"}
-                },
-                "kpis": {
-                    "target_reach": 10000,
-                    "target_engagement_rate": 3.5,
-                    "target_conversions": 100
-                }
-            })
-        elif "content" in prompt.lower():
-            content = json.dumps({
-                "content": "🚀 Revolutionize your business with AI! Our cutting-edge solutions help you automate processes, boost efficiency, and drive growth. Ready to transform your future? #AI #Innovation #BusinessGrowth",
-                "hashtags": ["#AI", "#Innovation", "#BusinessGrowth", "#Productivity"],
-                "platform": "instagram",
-                "content_type": "post"
-            })
+        if _MOCK_STRATEGY_RE.search(prompt):
+            content = _MOCK_STRATEGY
+        elif _MOCK_CONTENT_RE.search(prompt):
+            content = _MOCK_CONTENT
         else:
             content = f"Mock AI response for {model} model. Prompt: {prompt[:100]}..."
         
+        # Demo usage is illustrative, so estimate rather than tokenize
+        prompt_tokens = len(prompt) >> 2
+        completion_tokens = len(content) >> 2
+        
         return {
             "success": True,
             "content": content,
             "model": model,
             "usage": {
-                "prompt_tokens": len(prompt.split()),
-                "completion_tokens": len(content.split()) if isinstance(content, str) else 50,
-                "total_tokens": len(prompt.split()) + (len(content.split()) if isinstance(content, str) else 50)
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens
             },
             "response_time_ms": 500,
             "attempt": 1
@@ -256,35 +1071,47 @@ IMPORTANT: Respond with valid JSON only. No explanations or additional text.
     
     async def get_service_status(self) -> Dict[str, Any]:
         """Get AI service status"""
-        return {
-            "status": "available" if self.client else "demo_mode",
-            "api_key_configured": bool(self.api_key),
-            "openai_available": OPENAI_AVAILABLE,
-            "default_model": self.default_model,
-            "fallback_model": self.fallback_model,
-            "max_retries": self.max_retries,
-            "timeout": self.timeout
-        }
+        return dict(self._status)
     
     def get_cost_estimate(self, prompt_tokens: int, completion_tokens: int, model: str) -> float:
         """Estimate cost for API call"""
-        # Pricing per 1M tokens (approximate)
-        pricing = {
-            "gpt-4o": {"input": 0.005, "output": 0.015},
-            "gpt-4o-mini": {"input": 0.00015, "output": 0.0006},
-            "gpt-3.5-turbo": {"input": 0.0005, "output": 0.0015}
-        }
-        
-        model_pricing = pricing.get(model, pricing["gpt-4o"])
+        model_pricing = _PRICING.get(model, _PRICING["gpt-4o"])
         
         input_cost = (prompt_tokens / 1000000) * model_pricing["input"]
         output_cost = (completion_tokens / 1000000) * model_pricing["output"]
         
         return input_cost + output_cost
     
+    def get_cost_estimate_batch(
+        self,
+        prompt_tokens: Any,
+        completion_tokens: Any,
+        models: Any
+    ) -> Any:
+        """Estimate costs for many API calls in one vectorized pass
+        
+        Accepts aligned sequences (or numpy arrays) and returns a numpy array of
+        costs, or a list when numpy is not installed.
+        """
+        if not NUMPY_AVAILABLE:
+            return [
+                self.get_cost_estimate(p, c, m)
+                for p, c, m in zip(prompt_tokens, completion_tokens, models)
+            ]
+        
+        # Look up prices once per distinct model, then scatter back to rows
+        unique_models, inverse = np.unique(np.asarray(models, dtype=str), return_inverse=True)
+        default = _PRICING["gpt-4o"]
+        input_prices = np.array([_PRICING.get(m, default)["input"] for m in unique_models])[inverse]
+        output_prices = np.array([_PRICING.get(m, default)["output"] for m in unique_models])[inverse]
+        
+        prompt_tokens = np.asarray(prompt_tokens, dtype=np.float64)
+        completion_tokens = np.asarray(completion_tokens, dtype=np.float64)
+        return (prompt_tokens * input_prices + completion_tokens * output_prices) / 1e6
+    
     def is_available(self) -> bool:
         """Check if AI service is available"""
-        return bool(self.api_key) or settings.DEBUG
+        return self._available
 
 
 # Global AI client instance
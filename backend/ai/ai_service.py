@@ -3,15 +3,279 @@ AI Service Layer
 Orchestrates AI operations with proper abstraction and error handling
 """
 
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Tuple
+from collections import OrderedDict
+from dataclasses import dataclass
 from datetime import datetime
+from functools import partial
+import asyncio
+import copy
+import hashlib
+import logging
+import time
 from core.config import settings
 from core.errors import AIServiceError, ValidationError
-from ai.ai_client import ai_client
+from ai.ai_client import ai_client, close_shared_clients
 from ai.prompt_builder import prompt_builder
 from ai.schema_validator import schema_validator
-from ai.cost_tracker import cost_tracker
-import json
+from ai.cost_tracker import cost_tracker, AIResponse
+
+logger = logging.getLogger(__name__)
+
+# Default model per service type, resolved once from settings
+_DEFAULT_MODELS = {
+    "strategy": settings.OPENAI_MODEL_STRATEGY,
+    "content": settings.OPENAI_MODEL_CONTENT,
+    "analytics": settings.OPENAI_MODEL_STRATEGY,
+    "messaging": settings.OPENAI_MODEL_CONTENT
+}
+
+# Shared stand-in for responses without a usage block (read-only)
+_EMPTY_USAGE: Dict[str, int] = {}
+
+# Usage records are tracked off the request path in batches
+USAGE_QUEUE_SIZE = 10_000
+USAGE_FLUSH_BATCH = 128
+
+# Status scrapes within this window reuse the previous snapshot
+STATUS_CACHE_SECONDS = 10
+
+# Only the recent end of a conversation is sent with a reply prompt
+MAX_HISTORY_CHARS = 8000
+MAX_HISTORY_MESSAGES = 20
+MAX_MESSAGE_CHARS = 2000
+
+
+def _trim_conversation_history(history: Any) -> Any:
+    """Keep the most recent part of a conversation history (text or message list)"""
+    if isinstance(history, str):
+        if len(history) <= MAX_HISTORY_CHARS:
+            return history
+        # Drop the oldest text, starting at a line boundary when there is one
+        tail = history[-MAX_HISTORY_CHARS:]
+        newline = tail.find("\n")
+        return tail[newline + 1:] if newline != -1 else tail
+    
+    if isinstance(history, list):
+        return [
+            {**message, "content": str(message.get("content", ""))[:MAX_MESSAGE_CHARS]}
+            if isinstance(message, dict) else message
+            for message in history[-MAX_HISTORY_MESSAGES:]
+        ]
+    
+    return history
+
+# Response schemas, built once at import and shared by every request
+_STRATEGY_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "campaign_calendar": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "day": {"type": "integer"},
+                    "theme": {"type": "string"},
+                    "content_type": {"type": "string"},
+                    "platform": {"type": "string"},
+                    "objective": {"type": "string"},
+                    "key_message": {"type": "string"}
+                }
+            }
+        },
+        "weekly_themes": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "week": {"type": "integer"},
+                    "theme": {"type": "string"},
+                    "focus": {"type": "string"},
+                    "kpis": {"type": "array", "items": {"type": "string"}}
+                }
+            }
+        },
+        "content_distribution": {
+            "type": "object",
+            "properties": {
+                "instagram": {"type": "integer"},
+                "linkedin": {"type": "integer"},
+                "email": {"type": "integer"},
+                "sms": {"type": "integer"}
+            }
+        }
+    },
+    "required": ["campaign_calendar", "weekly_themes", "content_distribution"]
+}
+
+_CONTENT_SCHEMA_TEXT = {
+    "type": "object",
+    "properties": {
+        "content_type": {"type": "string"},
+        "platform": {"type": "string"},
+        "headline": {"type": "string"},
+        "body": {"type": "string"},
+        "cta": {"type": "string"},
+        "hashtags": {"type": "array", "items": {"type": "string"}},
+        "predicted_engagement_score": {"type": "number"}
+    },
+    "required": ["content_type", "platform", "headline", "body", "cta", "hashtags", "predicted_engagement_score"]
+}
+
+# Content-type specific variants extend the text schema without sharing its properties dict
+_CONTENT_SCHEMA_VISUAL = {
+    **_CONTENT_SCHEMA_TEXT,
+    "properties": {
+        **_CONTENT_SCHEMA_TEXT["properties"],
+        "visual_description": {"type": "string"},
+        "design_direction": {"type": "object"},
+        "image_generation_prompt": {"type": "string"}
+    }
+}
+
+_CONTENT_SCHEMA_VIDEO = {
+    **_CONTENT_SCHEMA_TEXT,
+    "properties": {
+        **_CONTENT_SCHEMA_TEXT["properties"],
+        "script": {"type": "object"},
+        "duration_seconds": {"type": "integer"},
+        "production_notes": {"type": "string"}
+    }
+}
+
+_CONTENT_SCHEMAS = {
+    "text": _CONTENT_SCHEMA_TEXT,
+    "visual": _CONTENT_SCHEMA_VISUAL,
+    "video": _CONTENT_SCHEMA_VIDEO
+}
+
+_ANALYTICS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "performance_summary": {
+            "type": "object",
+            "properties": {
+                "overall_score": {"type": "number"},
+                "engagement_rate": {"type": "number"},
+                "conversion_rate": {"type": "number"},
+                "reach": {"type": "integer"}
+            }
+        },
+        "top_performing_content": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "type": {"type": "string"},
+                    "engagement_score": {"type": "number"},
+                    "key_factors": {"type": "array", "items": {"type": "string"}}
+                }
+            }
+        },
+        "weak_segments": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "area": {"type": "string"},
+                    "issues": {"type": "array", "items": {"type": "string"}},
+                    "recommendations": {"type": "array", "items": {"type": "string"}}
+                }
+            }
+        },
+        "optimization_opportunities": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "opportunity": {"type": "string"},
+                    "potential_impact": {"type": "string"},
+                    "effort_required": {"type": "string"}
+                }
+            }
+        }
+    },
+    "required": ["performance_summary", "top_performing_content", "weak_segments", "optimization_opportunities"]
+}
+
+_MESSAGING_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "response_type": {"type": "string"},
+        "platform": {"type": "string"},
+        "reply_text": {"type": "string"},
+        "tone": {"type": "string"},
+        "escalation_needed": {"type": "boolean"},
+        "follow_up_required": {"type": "boolean"},
+        "sentiment": {"type": "string"},
+        "confidence_score": {"type": "number"},
+        "next_action": {"type": "string"}
+    },
+    "required": ["response_type", "platform", "reply_text", "tone", "escalation_needed", "follow_up_required", "sentiment", "confidence_score", "next_action"]
+}
+@dataclass(frozen=True, slots=True)
+class Pipeline:
+    """Static description of one prompt -> model -> validate -> track pipeline"""
+    service_type: str
+    prompt_service: str
+    prompt_template: str
+    temperature: float
+    schema: Optional[Dict[str, Any]]
+    validator_key: Optional[str]
+    label: str
+    failure_message: str
+    # Freshness-critical pipelines never reuse or share results
+    cacheable: bool = True
+
+# Generation pipelines keyed by prompt template name
+_PIPELINES = {
+    "campaign_calendar": Pipeline(
+        "strategy", "strategy", "campaign_calendar", 0.3,
+        _STRATEGY_SCHEMA, "campaign_calendar", "Strategy", "Strategy generation failed"
+    ),
+    "kpi_generator": Pipeline(
+        "strategy", "strategy", "kpi_generator", 0.2,
+        None, None, "KPI", "KPI generation failed"
+    ),
+    "media_mix_optimizer": Pipeline(
+        "analytics", "strategy", "media_mix_optimizer", 0.3,
+        None, None, "Media mix", "Media mix optimization failed"
+    ),
+    "text_generator": Pipeline(
+        "content", "content", "text_generator", 0.7,
+        _CONTENT_SCHEMA_TEXT, "content_generator", "Content", "Content generation failed"
+    ),
+    "visual_generator": Pipeline(
+        "content", "content", "visual_generator", 0.8,
+        _CONTENT_SCHEMA_VISUAL, None, "Visual content", "Visual content generation failed"
+    ),
+    "video_script_generator": Pipeline(
+        "content", "content", "video_script_generator", 0.75,
+        _CONTENT_SCHEMA_VIDEO, None, "Video script", "Video script generation failed"
+    ),
+    "performance_analyzer": Pipeline(
+        "analytics", "analytics", "performance_analyzer", 0.3,
+        _ANALYTICS_SCHEMA, "analytics_analyzer", "Analytics", "Analytics generation failed"
+    ),
+    "customer_reply": Pipeline(
+        "messaging", "messaging", "customer_reply", 0.5,
+        _MESSAGING_SCHEMA, "customer_reply", "Message", "Message generation failed",
+        cacheable=False
+    )
+}
+
+# Request sub-types routed to pipelines by the public entry points
+_STRATEGY_PIPELINES = {
+    "campaign_calendar": "campaign_calendar",
+    "kpi_generator": "kpi_generator",
+    "media_mix_optimizer": "media_mix_optimizer"
+}
+
+_CONTENT_PIPELINES = {
+    "text": "text_generator",
+    "visual": "visual_generator",
+    "video": "video_script_generator"
+}
 
 class AIService:
     """AI service orchestrator"""
@@ -22,465 +286,229 @@ class AIService:
         self.schema_validator = schema_validator
         self.cost_tracker = cost_tracker
         self.service_types = ["strategy", "content", "analytics", "messaging"]
+        self.analytics_short_circuits = 0
+        
+        # Background usage tracking (flusher starts with the first record)
+        self._usage_queue: asyncio.Queue = asyncio.Queue(maxsize=USAGE_QUEUE_SIZE)
+        self._flusher_task: Optional[asyncio.Task] = None
+        self.usage_records_dropped = 0
+        
+        # Validated results for repeated prompts: key -> (expires_at, data)
+        self._result_cache: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._result_cache_max = settings.AI_SERVICE_CACHE_SIZE
+        self._result_cache_ttl = settings.AI_SERVICE_CACHE_TTL_SECONDS
+        self._result_cache_max_temperature = settings.AI_SERVICE_CACHE_MAX_TEMPERATURE
+        self.cache_stats = {"hits": 0, "misses": 0, "inflight_joins": 0}
+        
+        # Generations in progress, keyed like the result cache, shared by identical requests
+        self._inflight: Dict[str, asyncio.Task] = {}
+        
+        # Last status snapshot: (expires_at, status)
+        self._status_snapshot: Optional[Tuple[float, Dict[str, Any]]] = None
+        
+        # Compile validators for the schemas the model is asked to follow
+        self._response_schemas = {
+            pipeline.validator_key: pipeline.schema
+            for pipeline in _PIPELINES.values()
+            if pipeline.validator_key
+        }
+        for schema_type, schema in self._response_schemas.items():
+            self.schema_validator.register_schema(schema_type, schema)
     
     async def generate_strategy(self, request_data: Dict[str, Any]) -> Dict[str, Any]:
         """Generate AI strategy for campaigns"""
         strategy_type = request_data.get("strategy_type", "campaign_calendar")
-        
-        if strategy_type == "campaign_calendar":
-            return await self._generate_campaign_calendar(request_data)
-        elif strategy_type == "kpi_generator":
-            return await self._generate_kpis(request_data)
-        elif strategy_type == "media_mix_optimizer":
-            return await self._optimize_media_mix(request_data)
-        else:
+        pipeline_key = _STRATEGY_PIPELINES.get(strategy_type)
+        if pipeline_key is None:
             raise AIServiceError(f"Unknown strategy type: {strategy_type}")
+        return await self._run(pipeline_key, request_data)
+    
+    async def generate_strategy_bundle(self, request_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Generate campaign calendar, KPIs and media mix concurrently"""
+        return await self._run_bundle(_STRATEGY_PIPELINES, request_data)
     
     async def _generate_campaign_calendar(self, request_data: Dict[str, Any]) -> Dict[str, Any]:
         """Generate campaign calendar"""
-        try:
-            # Build prompt
-            prompt = self.prompt_builder.build_prompt("strategy", "campaign_calendar", request_data)
-            
-            # Determine model based on complexity
-            model = self._select_model("strategy", request_data)
-            
-            # Generate response
-            start_time = datetime.utcnow()
-            response = await self.ai_client.generate_structured_response(
-                prompt=prompt,
-                model=model,
-                temperature=0.3,
-                system_prompt=self.prompt_builder.system_prompts["strategy"],
-                schema=self._get_strategy_schema()
-            )
-            
-            # Calculate response time
-            response_time_ms = int((datetime.utcnow() - start_time).total_seconds() * 1000)
-            
-            # Validate response
-            validated_response = self.schema_validator.validate_response("campaign_calendar", response.get("parsed_content", response.get("content", {})))
-            
-            # Track usage
-            self.cost_tracker.track_usage({
-                "business_id": request_data.get("business_id"),
-                "user_id": request_data.get("user_id"),
-                "service_type": "strategy",
-                "model_used": model,
-                "prompt_template": "campaign_calendar",
-                "prompt_tokens": response.get("usage", {}).get("prompt_tokens", 0),
-                "completion_tokens": response.get("usage", {}).get("completion_tokens", 0),
-                "response_time_ms": response_time_ms,
-                "success": response.get("success", False),
-                "error_message": None if response.get("success") else "AI generation failed"
-            })
-            
-            # Format response
-            return {
-                "success": True,
-                "data": validated_response,
-                "model": model,
-                "response_time_ms": response_time_ms,
-                "cost_estimate": self.cost_tracker.calculate_cost(
-                    model,
-                    response.get("usage", {}).get("prompt_tokens", 0),
-                    response.get("usage", {}).get("completion_tokens", 0)
-                )
-            }
-            
-        except ValidationError as e:
-            # Track failed usage
-            self.cost_tracker.track_usage({
-                "business_id": request_data.get("business_id"),
-                "user_id": request_data.get("user_id"),
-                "service_type": "strategy",
-                "model_used": model,
-                "prompt_template": "campaign_calendar",
-                "prompt_tokens": 0,
-                "completion_tokens": 0,
-                "response_time_ms": 0,
-                "success": False,
-                "error_message": str(e)
-            })
-            raise AIServiceError(f"Strategy validation failed: {str(e)}")
-        except Exception as e:
-            raise AIServiceError(f"Strategy generation failed: {str(e)}")
+        return await self._run("campaign_calendar", request_data)
     
     async def _generate_kpis(self, request_data: Dict[str, Any]) -> Dict[str, Any]:
         """Generate KPI recommendations"""
-        try:
-            # Build prompt
-            prompt = self.prompt_builder.build_prompt("strategy", "kpi_generator", request_data)
-            
-            # Generate response
-            model = self._select_model("strategy", request_data)
-            start_time = datetime.utcnow()
-            response = await self.ai_client.generate_structured_response(
-                prompt=prompt,
-                model=model,
-                temperature=0.2,
-                system_prompt=self.prompt_builder.system_prompts["strategy"]
-            )
-            
-            response_time_ms = int((datetime.utcnow() - start_time).total_seconds() * 1000)
-            validated_response = response.get("parsed_content", response.get("content", {}))
-            
-            # Track usage
-            self.cost_tracker.track_usage({
-                "business_id": request_data.get("business_id"),
-                "user_id": request_data.get("user_id"),
-                "service_type": "strategy",
-                "model_used": model,
-                "prompt_template": "kpi_generator",
-                "prompt_tokens": response.get("usage", {}).get("prompt_tokens", 0),
-                "completion_tokens": response.get("usage", {}).get("completion_tokens", 0),
-                "response_time_ms": response_time_ms,
-                "success": response.get("success", False)
-            })
-            
-            return {
-                "success": True,
-                "data": validated_response,
-                "model": model,
-                "response_time_ms": response_time_ms,
-                "cost_estimate": self.cost_tracker.calculate_cost(
-                    model,
-                    response.get("usage", {}).get("prompt_tokens", 0),
-                    response.get("usage", {}).get("completion_tokens", 0)
-                )
-            }
-        except Exception as e:
-            raise AIServiceError(f"KPI generation failed: {str(e)}")
+        return await self._run("kpi_generator", request_data)
     
     async def _optimize_media_mix(self, request_data: Dict[str, Any]) -> Dict[str, Any]:
         """Optimize media mix based on performance data"""
-        try:
-            # Build prompt
-            prompt = self.prompt_builder.build_prompt("strategy", "media_mix_optimizer", request_data)
-            
-            # Generate response
-            model = self._select_model("analytics", request_data)
-            start_time = datetime.utcnow()
-            response = await self.ai_client.generate_structured_response(
-                prompt=prompt,
-                model=model,
-                temperature=0.3,
-                system_prompt=self.prompt_builder.system_prompts["analytics"]
-            )
-            
-            response_time_ms = int((datetime.utcnow() - start_time).total_seconds() * 1000)
-            validated_response = response.get("parsed_content", response.get("content", {}))
-            
-            # Track usage
-            self.cost_tracker.track_usage({
-                "business_id": request_data.get("business_id"),
-                "user_id": request_data.get("user_id"),
-                "service_type": "analytics",
-                "model_used": model,
-                "prompt_template": "media_mix_optimizer",
-                "prompt_tokens": response.get("usage", {}).get("prompt_tokens", 0),
-                "completion_tokens": response.get("usage", {}).get("completion_tokens", 0),
-                "response_time_ms": response_time_ms,
-                "success": response.get("success", False)
-            })
-            
-            return {
-                "success": True,
-                "data": validated_response,
-                "model": model,
-                "response_time_ms": response_time_ms,
-                "cost_estimate": self.cost_tracker.calculate_cost(
-                    model,
-                    response.get("usage", {}).get("prompt_tokens", 0),
-                    response.get("usage", {}).get("completion_tokens", 0)
-                )
-            }
-        except Exception as e:
-            raise AIServiceError(f"Media mix optimization failed: {str(e)}")
+        return await self._run("media_mix_optimizer", request_data)
     
     async def generate_content(self, request_data: Dict[str, Any]) -> Dict[str, Any]:
         """Generate AI content"""
         content_type = request_data.get("content_type", "text")
-        
-        if content_type == "text":
-            return await self._generate_text_content(request_data)
-        elif content_type == "visual":
-            return await self._generate_visual_content(request_data)
-        elif content_type == "video":
-            return await self._generate_video_content(request_data)
-        else:
+        pipeline_key = _CONTENT_PIPELINES.get(content_type)
+        if pipeline_key is None:
             raise AIServiceError(f"Unknown content type: {content_type}")
+        return await self._run(pipeline_key, request_data)
+    
+    async def generate_content_bundle(self, request_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Generate text, visual and video content concurrently"""
+        return await self._run_bundle(_CONTENT_PIPELINES, request_data)
     
     async def _generate_text_content(self, request_data: Dict[str, Any]) -> Dict[str, Any]:
         """Generate text content"""
-        try:
-            # Build prompt
-            prompt = self.prompt_builder.build_prompt("content", "text_generator", request_data)
-            
-            # Determine model based on content type
-            model = self._select_model("content", request_data)
-            
-            # Generate response
-            start_time = datetime.utcnow()
-            response = await self.ai_client.generate_structured_response(
-                prompt=prompt,
-                model=model,
-                temperature=0.7,
-                system_prompt=self.prompt_builder.system_prompts["content"],
-                schema=self._get_content_schema("text")
-            )
-            
-            # Calculate response time
-            response_time_ms = int((datetime.utcnow() - start_time).total_seconds() * 1000)
-            
-            # Validate response
-            validated_response = self.schema_validator.validate_response("content_generator", response.get("parsed_content", response.get("content", {})))
-            
-            # Track usage
-            self.cost_tracker.track_usage({
-                "business_id": request_data.get("business_id"),
-                "user_id": request_data.get("user_id"),
-                "service_type": "content",
-                "model_used": model,
-                "prompt_template": "text_generator",
-                "prompt_tokens": response.get("usage", {}).get("prompt_tokens", 0),
-                "completion_tokens": response.get("usage", {}).get("completion_tokens", 0),
-                "response_time_ms": response_time_ms,
-                "success": response.get("success", False),
-                "error_message": None if response.get("success") else "Content generation failed"
-            })
-            
-            # Format response
-            return {
-                "success": True,
-                "data": validated_response,
-                "model": model,
-                "response_time_ms": response_time_ms,
-                "cost_estimate": self.cost_tracker.calculate_cost(
-                    model,
-                    response.get("usage", {}).get("prompt_tokens", 0),
-                    response.get("usage", {}).get("completion_tokens", 0)
-                )
-            }
-            
-        except ValidationError as e:
-            # Track failed usage
-            self.cost_tracker.track_usage({
-                "business_id": request_data.get("business_id"),
-                "user_id": request_data.get("user_id"),
-                "service_type": "content",
-                "model_used": model,
-                "prompt_template": "text_generator",
-                "prompt_tokens": 0,
-                "completion_tokens": 0,
-                "response_time_ms": 0,
-                "success": False,
-                "error_message": str(e)
-            })
-            raise AIServiceError(f"Content validation failed: {str(e)}")
-        except Exception as e:
-            raise AIServiceError(f"Content generation failed: {str(e)}")
+        return await self._run("text_generator", request_data)
     
     async def _generate_visual_content(self, request_data: Dict[str, Any]) -> Dict[str, Any]:
         """Generate visual content concept"""
-        try:
-            # Build prompt
-            prompt = self.prompt_builder.build_prompt("content", "visual_generator", request_data)
-            
-            model = self._select_model("content", request_data)
-            start_time = datetime.utcnow()
-            response = await self.ai_client.generate_structured_response(
-                prompt=prompt,
-                model=model,
-                temperature=0.8,
-                system_prompt=self.prompt_builder.system_prompts["content"],
-                schema=self._get_content_schema("visual")
-            )
-            
-            response_time_ms = int((datetime.utcnow() - start_time).total_seconds() * 1000)
-            validated_response = response.get("parsed_content", response.get("content", {}))
-            
-            # Track usage
-            self.cost_tracker.track_usage({
-                "business_id": request_data.get("business_id"),
-                "user_id": request_data.get("user_id"),
-                "service_type": "content",
-                "model_used": model,
-                "prompt_template": "visual_generator",
-                "prompt_tokens": response.get("usage", {}).get("prompt_tokens", 0),
-                "completion_tokens": response.get("usage", {}).get("completion_tokens", 0),
-                "response_time_ms": response_time_ms,
-                "success": response.get("success", False)
-            })
-            
-            return {
-                "success": True,
-                "data": validated_response,
-                "model": model,
-                "response_time_ms": response_time_ms,
-                "cost_estimate": self.cost_tracker.calculate_cost(
-                    model,
-                    response.get("usage", {}).get("prompt_tokens", 0),
-                    response.get("usage", {}).get("completion_tokens", 0)
-                )
-            }
-        except Exception as e:
-            raise AIServiceError(f"Visual content generation failed: {str(e)}")
+        return await self._run("visual_generator", request_data)
     
     async def _generate_video_content(self, request_data: Dict[str, Any]) -> Dict[str, Any]:
         """Generate video script"""
-        try:
-            # Build prompt
-            prompt = self.prompt_builder.build_prompt("content", "video_script_generator", request_data)
-            
-            model = self._select_model("content", request_data)
-            start_time = datetime.utcnow()
-            response = await self.ai_client.generate_structured_response(
-                prompt=prompt,
-                model=model,
-                temperature=0.75,
-                system_prompt=self.prompt_builder.system_prompts["content"],
-                schema=self._get_content_schema("video")
-            )
-            
-            response_time_ms = int((datetime.utcnow() - start_time).total_seconds() * 1000)
-            validated_response = response.get("parsed_content", response.get("content", {}))
-            
-            # Track usage
-            self.cost_tracker.track_usage({
-                "business_id": request_data.get("business_id"),
-                "user_id": request_data.get("user_id"),
-                "service_type": "content",
-                "model_used": model,
-                "prompt_template": "video_script_generator",
-                "prompt_tokens": response.get("usage", {}).get("prompt_tokens", 0),
-                "completion_tokens": response.get("usage", {}).get("completion_tokens", 0),
-                "response_time_ms": response_time_ms,
-                "success": response.get("success", False)
-            })
-            
+        return await self._run("video_script_generator", request_data)
+    
+    async def generate_analytics(self, request_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Generate AI analytics insights"""
+        # Nothing to analyze yet: answer from a template instead of calling the model
+        if self._is_trivial_analytics(request_data):
+            self.analytics_short_circuits += 1
             return {
                 "success": True,
-                "data": validated_response,
-                "model": model,
-                "response_time_ms": response_time_ms,
-                "cost_estimate": self.cost_tracker.calculate_cost(
-                    model,
-                    response.get("usage", {}).get("prompt_tokens", 0),
-                    response.get("usage", {}).get("completion_tokens", 0)
-                )
+                "data": self._empty_analytics_insights(request_data),
+                "model": "rule_based",
+                "response_time_ms": 0,
+                "cost_estimate": 0.0
             }
-        except Exception as e:
-            raise AIServiceError(f"Video script generation failed: {str(e)}")
+        
+        return await self._run("performance_analyzer", request_data)
     
-    async def generate_analytics(self, request_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Generate AI analytics insights"""
+    async def generate_message_reply(self, request_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Generate AI message reply"""
+        history = request_data.get("conversation_history")
+        trimmed = _trim_conversation_history(history)
+        if trimmed is not history:
+            request_data = {**request_data, "conversation_history": trimmed}
+        return await self._run("customer_reply", request_data)
+    
+    async def _run_bundle(self, pipelines: Dict[str, str], request_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Run independent pipelines concurrently, keyed by request sub-type
+        
+        Concurrency is bounded by the AI client's request semaphore
+        (AI_MAX_CONCURRENT). A failing pipeline is reported in its own slot
+        without cancelling the others.
+        """
+        results = await asyncio.gather(
+            *(self._run(pipeline_key, request_data) for pipeline_key in pipelines.values()),
+            return_exceptions=True
+        )
+        
+        bundle = {}
+        for sub_type, result in zip(pipelines, results):
+            if isinstance(result, Exception):
+                bundle[sub_type] = {"success": False, "error": str(result)}
+            else:
+                bundle[sub_type] = result
+        return bundle
+    
+    async def _run(self, pipeline_key: str, request_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Run a generation pipeline: build prompt, call model, validate and track usage"""
+        pipeline = _PIPELINES[pipeline_key]
+        
         try:
-            # Build prompt
-            prompt = self.prompt_builder.build_analytics_prompt(request_data)
-            
-            # Determine model based on complexity
-            model = self._select_model("analytics", request_data)
+            # Determine model based on service type and complexity
+            model = self._select_model(pipeline.service_type, request_data)
             
-            # Generate response
-            start_time = datetime.utcnow()
-            response = await self.ai_client.generate_structured_response(
-                prompt=prompt,
-                model=model,
-                temperature=0.3,
-                system_prompt=self.prompt_builder.system_prompts["analytics"],
-                schema=self._get_analytics_schema()
+            # Build the task prompt; the static system prompt goes first as its own message
+            # so the shared prefix is eligible for provider-side prompt caching
+            prompt = self.prompt_builder.build_prompt(
+                pipeline.prompt_service, pipeline.prompt_template, request_data, include_system=False
             )
-            
-            # Calculate response time
-            response_time_ms = int((datetime.utcnow() - start_time).total_seconds() * 1000)
-            
-            # Validate response
-            validated_response = self.schema_validator.validate_response("analytics_analyzer", response.get("parsed_content", response.get("content", {})))
-            
-            # Track usage
-            self.cost_tracker.track_usage({
-                "business_id": request_data.get("business_id"),
-                "user_id": request_data.get("user_id"),
-                "service_type": "analytics",
-                "model_used": model,
-                "prompt_template": "performance_analyzer",
-                "prompt_tokens": response.get("usage", {}).get("prompt_tokens", 0),
-                "completion_tokens": response.get("usage", {}).get("completion_tokens", 0),
-                "response_time_ms": response_time_ms,
-                "success": response.get("success", False),
-                "error_message": None if response.get("success") else "Analytics generation failed"
-            })
-            
-            # Format response
+        except Exception as e:
+            raise AIServiceError(f"{pipeline.failure_message}: {str(e)}")
+        
+        # Serve repeated prompts from already validated results
+        cache_key = self._result_cache_key(pipeline_key, pipeline, model, prompt, request_data)
+        if cache_key is None:
+            return await self._generate(pipeline, model, prompt, request_data, None)
+        
+        cached = self._result_cache_get(cache_key)
+        if cached is not None:
             return {
                 "success": True,
-                "data": validated_response,
+                "data": cached,
                 "model": model,
-                "response_time_ms": response_time_ms,
-                "cost_estimate": self.cost_tracker.calculate_cost(
-                    model,
-                    response.get("usage", {}).get("prompt_tokens", 0),
-                    response.get("usage", {}).get("completion_tokens", 0)
-                )
-            }
-            
-        except ValidationError as e:
-            # Track failed usage
-            self.cost_tracker.track_usage({
-                "business_id": request_data.get("business_id"),
-                "user_id": request_data.get("user_id"),
-                "service_type": "analytics",
-                "model_used": model,
-                "prompt_template": "performance_analyzer",
-                "prompt_tokens": 0,
-                "completion_tokens": 0,
                 "response_time_ms": 0,
-                "success": False,
-                "error_message": str(e)
-            })
-            raise AIServiceError(f"Analytics validation failed: {str(e)}")
-        except Exception as e:
-            raise AIServiceError(f"Analytics generation failed: {str(e)}")
+                "cost_estimate": 0.0,
+                "cache": "hit"
+            }
+        
+        # Join an identical request that is already in flight instead of calling the model again;
+        # the shared task is shielded so a cancelled caller doesn't cancel it for the others
+        task = self._inflight.get(cache_key)
+        if task is None:
+            task = asyncio.ensure_future(self._generate(pipeline, model, prompt, request_data, cache_key))
+            task.add_done_callback(partial(self._inflight_done, cache_key))
+            self._inflight[cache_key] = task
+            return await asyncio.shield(task)
+        
+        self.cache_stats["inflight_joins"] += 1
+        result = await asyncio.shield(task)
+        # The originating caller holds the task's result; joiners get their own copy
+        return {**copy.deepcopy(result), "cost_estimate": 0.0, "cache": "inflight"}
     
-    async def generate_message_reply(self, request_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Generate AI message reply"""
+    async def _generate(
+        self,
+        pipeline: Pipeline,
+        model: str,
+        prompt: str,
+        request_data: Dict[str, Any],
+        cache_key: Optional[str]
+    ) -> Dict[str, Any]:
+        """Call the model for a built prompt, then validate, price and cache the result"""
+        # Bound before the first call that can fail, so handlers never see unbound names
+        usage_response: Optional[AIResponse] = None
+        cost = 0.0
         try:
-            # Build prompt
-            prompt = self.prompt_builder.build_messaging_prompt(request_data)
-            
-            # Determine model based on complexity
-            model = self._select_model("messaging", request_data)
+            # Validate array items as they stream in, so a bad item aborts generation early
+            stream_validator = (
+                self.schema_validator.streaming_validator(pipeline.validator_key)
+                if pipeline.validator_key else None
+            )
             
             # Generate response
-            start_time = datetime.utcnow()
+            start_ns = time.perf_counter_ns()
             response = await self.ai_client.generate_structured_response(
                 prompt=prompt,
                 model=model,
-                temperature=0.5,
-                system_prompt=self.prompt_builder.system_prompts["messaging"],
-                schema=self._get_messaging_schema()
+                temperature=pipeline.temperature,
+                system_prompt=self.prompt_builder.system_prompts[pipeline.service_type],
+                schema=pipeline.schema,
+                on_token=stream_validator.feed if stream_validator is not None else None
             )
             
             # Calculate response time
-            response_time_ms = int((datetime.utcnow() - start_time).total_seconds() * 1000)
+            response_time_ms = (time.perf_counter_ns() - start_ns) // 1_000_000
             
-            # Validate response
-            validated_response = self.schema_validator.validate_response("customer_reply", response.get("parsed_content", response.get("content", {})))
+            # Price the call before validating, so rejected responses are still billed
+            usage = response.get("usage") or _EMPTY_USAGE
+            usage_response = AIResponse(
+                model=model,
+                input_tokens=usage.get("prompt_tokens", 0),
+                output_tokens=usage.get("completion_tokens", 0),
+                tokens_used=usage.get("total_tokens", 0),
+                cached_tokens=usage.get("cached_tokens", 0)
+            )
+            cost = await self.cost_tracker.calculate_cost(usage_response)
+            
+            # Validate response when the pipeline has a registered schema; large documents
+            # are walked in a worker thread so other requests keep the event loop
+            validated_response = response.get("parsed_content")
+            if validated_response is None:
+                validated_response = response.get("content", {})
+            if pipeline.validator_key:
+                validated_response = await asyncio.to_thread(
+                    self.schema_validator.validate_response, pipeline.validator_key, validated_response
+                )
             
-            # Track usage
-            self.cost_tracker.track_usage({
-                "business_id": request_data.get("business_id"),
-                "user_id": request_data.get("user_id"),
-                "service_type": "messaging",
-                "model_used": model,
-                "prompt_template": "customer_reply",
-                "prompt_tokens": response.get("usage", {}).get("prompt_tokens", 0),
-                "completion_tokens": response.get("usage", {}).get("completion_tokens", 0),
-                "response_time_ms": response_time_ms,
-                "success": response.get("success", False),
-                "error_message": None if response.get("success") else "Message generation failed"
-            })
+            # Queue usage tracking off the request path
+            self._enqueue_usage(request_data, usage_response, cost, pipeline)
+            self._result_cache_store(cache_key, validated_response)
             
             # Format response
             return {
@@ -488,217 +516,217 @@ class AIService:
                 "data": validated_response,
                 "model": model,
                 "response_time_ms": response_time_ms,
-                "cost_estimate": self.cost_tracker.calculate_cost(
-                    model,
-                    response.get("usage", {}).get("prompt_tokens", 0),
-                    response.get("usage", {}).get("completion_tokens", 0)
-                )
+                "cost_estimate": cost
             }
             
         except ValidationError as e:
-            # Track failed usage
-            self.cost_tracker.track_usage({
-                "business_id": request_data.get("business_id"),
-                "user_id": request_data.get("user_id"),
-                "service_type": "messaging",
-                "model_used": model,
-                "prompt_template": "customer_reply",
-                "prompt_tokens": 0,
-                "completion_tokens": 0,
-                "response_time_ms": 0,
-                "success": False,
-                "error_message": str(e)
-            })
-            raise AIServiceError(f"Message validation failed: {str(e)}")
+            # Track failed usage, including tokens spent on a rejected response
+            self._enqueue_usage(request_data, usage_response or AIResponse(model, 0, 0, 0), cost, pipeline)
+            raise AIServiceError(f"{pipeline.label} validation failed: {str(e)}")
         except Exception as e:
-            raise AIServiceError(f"Message generation failed: {str(e)}")
+            raise AIServiceError(f"{pipeline.failure_message}: {str(e)}")
     
-    def _select_model(self, service_type: str, request_data: Dict[str, Any]) -> str:
-        """Select appropriate AI model based on service type and complexity"""
-        # Default models for each service type
-        default_models = {
-            "strategy": settings.OPENAI_MODEL_STRATEGY,
-            "content": settings.OPENAI_MODEL_CONTENT,
-            "analytics": settings.OPENAI_MODEL_STRATEGY,
-            "messaging": settings.OPENAI_MODEL_CONTENT
-        }
+    def _result_cache_key(
+        self,
+        pipeline_key: str,
+        pipeline: Pipeline,
+        model: str,
+        prompt: str,
+        request_data: Dict[str, Any]
+    ) -> Optional[str]:
+        """Build a result cache key, or None if this request must not be cached"""
+        if (
+            self._result_cache_max <= 0
+            or not pipeline.cacheable
+            or pipeline.temperature > self._result_cache_max_temperature
+            or request_data.get("nocache")
+        ):
+            return None
         
-        model = default_models.get(service_type, settings.OPENAI_MODEL_STRATEGY)
+        digest = hashlib.blake2b(digest_size=16)
+        for part in (pipeline_key, model, repr(pipeline.temperature), prompt):
+            digest.update(part.encode())
+            digest.update(b"\x00")
+        return digest.hexdigest()
+    
+    def _inflight_done(self, cache_key: str, task: asyncio.Task):
+        """Forget a finished in-flight generation"""
+        self._inflight.pop(cache_key, None)
+        if not task.cancelled():
+            # Mark the exception retrieved even if every waiter has gone away
+            task.exception()
+    
+    def _result_cache_get(self, cache_key: str) -> Optional[Any]:
+        """Get a copy of an unexpired cached result, refreshing its LRU position"""
+        entry = self._result_cache.get(cache_key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._result_cache[cache_key]
+            self.cache_stats["misses"] += 1
+            return None
         
-        # Override with specific model if requested
-        if "model" in request_data:
-            model = request_data["model"]
+        self._result_cache.move_to_end(cache_key)
+        self.cache_stats["hits"] += 1
+        return copy.deepcopy(entry[1])
+    
+    def _result_cache_store(self, cache_key: Optional[str], data: Any):
+        """Store a copy of a validated result, evicting the least recently used entry"""
+        if cache_key is None:
+            return
         
-        # Use cheaper model for simple content generation
-        if service_type == "content" and request_data.get("complexity", "medium") == "simple":
-            model = settings.OPENAI_MODEL_CONTENT
+        # Copied so the caller that produced it can't mutate the cached entry
+        self._result_cache[cache_key] = (time.monotonic() + self._result_cache_ttl, copy.deepcopy(data))
+        self._result_cache.move_to_end(cache_key)
+        if len(self._result_cache) > self._result_cache_max:
+            self._result_cache.popitem(last=False)
+    
+    def _enqueue_usage(self, request_data: Dict[str, Any], usage_response: AIResponse, cost: float, pipeline: Pipeline):
+        """Hand a usage record to the background flusher without awaiting the tracker"""
+        if self._flusher_task is None or self._flusher_task.done():
+            self._flusher_task = asyncio.create_task(self._flush_usage_loop())
         
-        return model
+        try:
+            self._usage_queue.put_nowait((
+                request_data.get("business_id") or "unknown",
+                usage_response,
+                cost,
+                f"{pipeline.service_type}.{pipeline.prompt_template}"
+            ))
+        except asyncio.QueueFull:
+            self.usage_records_dropped += 1
+            logger.warning(f"Usage queue full, dropped record ({self.usage_records_dropped} total)")
     
-    def _get_strategy_schema(self) -> Dict[str, Any]:
-        """Get schema for strategy generation"""
-        return {
-            "type": "object",
-            "properties": {
-                "campaign_calendar": {
-                    "type": "array",
-                    "items": {
-                        "type": "object",
-                        "properties": {
-                            "day": {"type": "integer"},
-                            "theme": {"type": "string"},
-                            "content_type": {"type": "string"},
-                            "platform": {"type": "string"},
-                            "objective": {"type": "string"},
-                            "key_message": {"type": "string"}
-                        }
-                    }
-                },
-                "weekly_themes": {
-                    "type": "array",
-                    "items": {
-                        "type": "object",
-                        "properties": {
-                            "week": {"type": "integer"},
-                            "theme": {"type": "string"},
-                            "focus": {"type": "string"},
-                            "kpis": {"type": "array", "items": {"type": "string"}}
-                        }
-                    }
-                },
-                "content_distribution": {
-                    "type": "object",
-                    "properties": {
-                        "instagram": {"type": "integer"},
-                        "linkedin": {"type": "integer"},
-                        "email": {"type": "integer"},
-                        "sms": {"type": "integer"}
-                    }
-                }
-            },
-            "required": ["campaign_calendar", "weekly_themes", "content_distribution"]
-        }
+    async def _flush_usage_loop(self):
+        """Drain queued usage records into the cost tracker in batches"""
+        queue = self._usage_queue
+        while True:
+            batch = [await queue.get()]
+            while len(batch) < USAGE_FLUSH_BATCH and not queue.empty():
+                batch.append(queue.get_nowait())
+            
+            try:
+                await self.cost_tracker.track_usage_bulk(batch)
+            except Exception as e:
+                logger.error(f"Usage flush failed for {len(batch)} records: {str(e)}")
+            finally:
+                for _ in batch:
+                    queue.task_done()
     
-    def _get_content_schema(self, content_type: str) -> Dict[str, Any]:
-        """Get schema for content generation"""
-        base_schema = {
-            "type": "object",
-            "properties": {
-                "content_type": {"type": "string"},
-                "platform": {"type": "string"},
-                "headline": {"type": "string"},
-                "body": {"type": "string"},
-                "cta": {"type": "string"},
-                "hashtags": {"type": "array", "items": {"type": "string"}},
-                "predicted_engagement_score": {"type": "number"}
-            },
-            "required": ["content_type", "platform", "headline", "body", "cta", "hashtags", "predicted_engagement_score"]
-        }
+    async def shutdown(self):
+        """Flush pending usage records, stop the background flusher and close pooled connections
         
-        # Add content-type specific fields
-        if content_type == "visual":
-            base_schema["properties"].update({
-                "visual_description": {"type": "string"},
-                "design_direction": {"type": "object"},
-                "image_generation_prompt": {"type": "string"}
-            })
-        elif content_type == "video":
-            base_schema["properties"].update({
-                "script": {"type": "object"},
-                "duration_seconds": {"type": "integer"},
-                "production_notes": {"type": "string"}
-            })
+        Call from the shutdown handler of the app that mounts the AI routes;
+        records still queued when the process exits are otherwise lost.
+        """
+        if self._flusher_task is not None:
+            if not self._flusher_task.done():
+                await self._usage_queue.join()
+                self._flusher_task.cancel()
+                try:
+                    await self._flusher_task
+                except asyncio.CancelledError:
+                    pass
+            self._flusher_task = None
         
-        return base_schema
+        await close_shared_clients()
     
-    def _get_analytics_schema(self) -> Dict[str, Any]:
-        """Get schema for analytics generation"""
+    def _is_trivial_analytics(self, request_data: Dict[str, Any]) -> bool:
+        """Check whether analytics input carries no non-zero metrics"""
+        def has_signal(value: Any) -> bool:
+            if isinstance(value, dict):
+                return any(has_signal(v) for v in value.values())
+            if isinstance(value, (list, tuple)):
+                return any(has_signal(v) for v in value)
+            if isinstance(value, bool):
+                return value
+            if isinstance(value, (int, float)):
+                return value != 0
+            return bool(value)
+        
+        return not any(
+            has_signal(request_data.get(key))
+            for key in ("performance_data", "platform_performance", "content_type_performance")
+        )
+    
+    def _empty_analytics_insights(self, request_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Build deterministic insights for a period with no recorded performance"""
+        time_period = request_data.get("time_period", "this period")
         return {
-            "type": "object",
-            "properties": {
-                "performance_summary": {
-                    "type": "object",
-                    "properties": {
-                        "overall_score": {"type": "number"},
-                        "engagement_rate": {"type": "number"},
-                        "conversion_rate": {"type": "number"},
-                        "reach": {"type": "integer"}
-                    }
-                },
-                "top_performing_content": {
-                    "type": "array",
-                    "items": {
-                        "type": "object",
-                        "properties": {
-                            "type": {"type": "string"},
-                            "engagement_score": {"type": "number"},
-                            "key_factors": {"type": "array", "items": {"type": "string"}}
-                        }
-                    }
-                },
-                "weak_segments": {
-                    "type": "array",
-                    "items": {
-                        "type": "object",
-                        "properties": {
-                            "area": {"type": "string"},
-                            "issues": {"type": "array", "items": {"type": "string"}},
-                            "recommendations": {"type": "array", "items": {"type": "string"}}
-                        }
-                    }
-                },
-                "optimization_opportunities": {
-                    "type": "array",
-                    "items": {
-                        "type": "object",
-                        "properties": {
-                            "opportunity": {"type": "string"},
-                            "potential_impact": {"type": "string"},
-                            "effort_required": {"type": "string"}
-                        }
-                    }
-                }
+            "performance_summary": {
+                "overall_score": 0,
+                "engagement_rate": 0.0,
+                "conversion_rate": 0.0,
+                "reach": 0
             },
-            "required": ["performance_summary", "top_performing_content", "weak_segments", "optimization_opportunities"]
+            "top_performing_content": [],
+            "weak_segments": [
+                {
+                    "area": "Activity",
+                    "issues": [f"No performance data recorded for {time_period}"],
+                    "recommendations": ["Publish content and connect platforms to start collecting metrics"]
+                }
+            ],
+            "optimization_opportunities": [
+                {
+                    "opportunity": "Establish a posting baseline",
+                    "potential_impact": "high",
+                    "effort_required": "low"
+                }
+            ]
         }
     
-    def _get_messaging_schema(self) -> Dict[str, Any]:
+    def _select_model(self, service_type: str, request_data: Dict[str, Any]) -> str:
+        """Select appropriate AI model based on service type and complexity"""
+        # Use cheaper model for simple content generation
+        if service_type == "content" and request_data.get("complexity") == "simple":
+            return settings.OPENAI_MODEL_CONTENT
+        
+        # Override with specific model if requested
+        return request_data.get("model") or _DEFAULT_MODELS.get(service_type, settings.OPENAI_MODEL_STRATEGY)
+    
+    @staticmethod
+    def _get_strategy_schema() -> Dict[str, Any]:
+        """Get schema for strategy generation"""
+        return _STRATEGY_SCHEMA
+    
+    @staticmethod
+    def _get_content_schema(content_type: str) -> Dict[str, Any]:
+        """Get schema for content generation"""
+        return _CONTENT_SCHEMAS.get(content_type, _CONTENT_SCHEMA_TEXT)
+    
+    @staticmethod
+    def _get_analytics_schema() -> Dict[str, Any]:
+        """Get schema for analytics generation"""
+        return _ANALYTICS_SCHEMA
+    
+    @staticmethod
+    def _get_messaging_schema() -> Dict[str, Any]:
         """Get schema for message generation"""
-        return {
-            "type": "object",
-            "properties": {
-                "response_type": {"type": "string"},
-                "platform": {"type": "string"},
-                "reply_text": {"type": "string"},
-                "tone": {"type": "string"},
-                "escalation_needed": {"type": "boolean"},
-                "follow_up_required": {"type": "boolean"},
-                "sentiment": {"type": "string"},
-                "confidence_score": {"type": "number"},
-                "next_action": {"type": "string"}
-            },
-            "required": ["response_type", "platform", "reply_text", "tone", "escalation_needed", "follow_up_required", "sentiment", "confidence_score", "next_action"]
-        }
+        return _MESSAGING_SCHEMA
     
     async def get_service_status(self) -> Dict[str, Any]:
-        """Get AI service status"""
+        """Get AI service status, reusing a snapshot taken within STATUS_CACHE_SECONDS"""
+        now = time.monotonic()
+        if self._status_snapshot is not None and self._status_snapshot[0] > now:
+            return self._status_snapshot[1]
+        
         try:
             # Check AI client availability
             ai_available = self.ai_client.is_available()
             
-            # Get model info
-            model_info = await self.ai_client.get_model_info(settings.OPENAI_MODEL_STRATEGY)
-            
-            # Get recent usage
-            daily_usage = self.cost_tracker.get_daily_usage()
+            # Client configuration is fixed after construction, so this needs no API call
+            model_info = await self.ai_client.get_service_status()
             
-            return {
+            status = {
                 "status": "healthy" if ai_available else "unhealthy",
                 "ai_client_available": ai_available,
                 "current_model": settings.OPENAI_MODEL_STRATEGY,
                 "model_info": model_info,
-                "daily_usage": daily_usage,
                 "supported_services": self.service_types,
+                "result_cache": {"size": len(self._result_cache), **self.cache_stats},
+                "inflight_requests": len(self._inflight),
+                "pending_usage_records": self._usage_queue.qsize(),
+                "usage_records_dropped": self.usage_records_dropped,
                 "timestamp": datetime.utcnow().isoformat()
             }
             
@@ -708,6 +736,9 @@ class AIService:
                 "error": str(e),
                 "timestamp": datetime.utcnow().isoformat()
             }
+        
+        self._status_snapshot = (now + STATUS_CACHE_SECONDS, status)
+        return status
     
     async def get_usage_statistics(self, period: str = "daily") -> Dict[str, Any]:
         """Get usage statistics"""
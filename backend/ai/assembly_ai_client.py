@@ -4,61 +4,221 @@ Uses AssemblyAI API for text/sentiment analysis of marketing content
 """
 
 import aiohttp
+import asyncio
+import hashlib
+import json
 import logging
-from typing import Dict, Any, Optional
+import os
+import random
+import re
+import time
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
 
 logger = logging.getLogger(__name__)
 
-ASSEMBLY_AI_KEY = "4c01bda685ef4313a48e1f7f71889bf4"
+ASSEMBLY_AI_KEY = os.getenv("ASSEMBLY_AI_KEY", "")  # Set in .env for production
 BASE_URL = "https://api.assemblyai.com/v2"
 HEADERS = {
     "authorization": ASSEMBLY_AI_KEY,
     "content-type": "application/json",
 }
 
+def _json_dumps(obj: Any) -> str:
+    """Serialize a request body, using orjson when available."""
+    return orjson.dumps(obj).decode() if ORJSON_AVAILABLE else json.dumps(obj)
+
+
+def _json_loads(data: Any) -> Any:
+    """Parse a response body, using orjson when available."""
+    return orjson.loads(data) if ORJSON_AVAILABLE else json.loads(data)
+
+
+# Per-endpoint timeouts: fail fast when the host is unreachable, give LeMUR time to answer.
+# Only sock_connect bounds connecting; 'connect' would also count waiting for a pooled socket
+LEMUR_TIMEOUT = aiohttp.ClientTimeout(total=30, sock_connect=2, sock_read=20)
+SUBMIT_TIMEOUT = aiohttp.ClientTimeout(total=10, sock_connect=2, sock_read=5)
+POLL_TIMEOUT = aiohttp.ClientTimeout(total=10, sock_connect=2, sock_read=5)
+HEALTH_TIMEOUT = aiohttp.ClientTimeout(total=5, sock_connect=2, sock_read=3)
+
+# Shared session, created on first use so connections to AssemblyAI stay alive between calls
+_session: Optional[aiohttp.ClientSession] = None
+_session_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+async def _get_session() -> aiohttp.ClientSession:
+    """Get the shared session, creating it for the running event loop on first use."""
+    global _session, _session_loop
+    loop = asyncio.get_running_loop()
+    if _session is not None and not _session.closed and _session_loop is loop:
+        return _session
+
+    stale = _session
+    session = aiohttp.ClientSession(
+        headers=HEADERS,
+        json_serialize=_json_dumps,
+        # Larger read buffer so big transcript bodies arrive without flow-control stalls
+        read_bufsize=2**22,
+        # Bounded pool: bursts queue for a socket instead of opening unbounded connections
+        connector=aiohttp.TCPConnector(
+            limit=50, limit_per_host=20, ttl_dns_cache=300, keepalive_timeout=75
+        ),
+    )
+    _session, _session_loop = session, loop
+
+    # A session left from an earlier event loop would otherwise leak its connector and sockets
+    if stale is not None and not stale.closed:
+        try:
+            await stale.close()
+        except Exception as e:
+            logger.debug(f"Closing stale AssemblyAI session failed: {e}")
+    return session
+
+
+# Circuit breaker: after this many consecutive failures, calls skip the API for the cooldown
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_COOLDOWN_SECONDS = 30.0
+_consecutive_failures = 0
+_breaker_open_until = 0.0
+
+
+def _breaker_open() -> bool:
+    """Whether calls should skip the API after repeated failures."""
+    return time.monotonic() < _breaker_open_until
+
+
+def _record_call(ok: bool) -> None:
+    """Update the circuit breaker with the outcome of an API call."""
+    global _consecutive_failures, _breaker_open_until
+    if ok:
+        _consecutive_failures = 0
+        return
+    _consecutive_failures += 1
+    if _consecutive_failures >= BREAKER_FAILURE_THRESHOLD:
+        _consecutive_failures = 0
+        _breaker_open_until = time.monotonic() + BREAKER_COOLDOWN_SECONDS
+        logger.warning(f"AssemblyAI circuit open for {BREAKER_COOLDOWN_SECONDS:.0f}s after repeated failures")
+
+
+# Successful LeMUR analyses, keyed by normalized text hash: key -> (expires_at, result)
+ANALYSIS_CACHE_SIZE = 1024
+ANALYSIS_CACHE_TTL_SECONDS = 3600
+_analysis_cache: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+
+
+def _analysis_cache_key(text: str) -> str:
+    """Hash text with case and whitespace normalized, so re-submitted copy shares an entry."""
+    return hashlib.sha256(" ".join(text.lower().split()).encode()).hexdigest()
+
+
+def _cache_analysis(cache_key: str, result: Dict[str, Any]) -> None:
+    """Store an analysis, evicting the least recently used entry."""
+    _analysis_cache[cache_key] = (time.monotonic() + ANALYSIS_CACHE_TTL_SECONDS, result)
+    _analysis_cache.move_to_end(cache_key)
+    if len(_analysis_cache) > ANALYSIS_CACHE_SIZE:
+        _analysis_cache.popitem(last=False)
+
+
+# LeMUR analysis prompt; the content is inserted between the fixed prefix and suffix
+_LEMUR_PROMPT_PREFIX = (
+    "Analyze the following marketing content and provide:\n"
+    "1. Overall sentiment (positive/neutral/negative)\n"
+    "2. Key themes (list of 3-5 keywords)\n"
+    "3. Engagement prediction (low/medium/high)\n"
+    "4. One improvement suggestion\n\n"
+    "Content: "
+)
+_LEMUR_PROMPT_SUFFIX = "\n\nRespond in JSON format with keys: sentiment, themes, engagement, suggestion"
+_ANALYSIS_KEYS = ("sentiment", "themes", "engagement", "suggestion")
+
+
+def _parse_analysis(response: Any) -> Optional[Dict[str, Any]]:
+    """
+    Parse LeMUR's JSON answer, ignoring code fences or prose around the object.
+    Returns None when it isn't an object with the requested keys.
+    """
+    if not isinstance(response, str):
+        return None
+    start = response.find("{")
+    end = response.rfind("}")
+    if start == -1 or end < start:
+        return None
+    try:
+        analysis = _json_loads(response[start:end + 1])
+    except ValueError:
+        return None
+    if not isinstance(analysis, dict) or any(key not in analysis for key in _ANALYSIS_KEYS):
+        return None
+    return analysis
+
 
 async def analyze_text(text: str) -> Dict[str, Any]:
     """
     Use AssemblyAI LeMUR to analyze marketing content text.
     Returns sentiment, key themes, and improvement suggestions.
     """
+    # Repeated copy is answered from earlier analyses without calling the API
+    cache_key = _analysis_cache_key(text)
+    cached = _analysis_cache.get(cache_key)
+    if cached is not None and cached[0] > time.monotonic():
+        _analysis_cache.move_to_end(cache_key)
+        return {**cached[1], "cached": True}
+
+    if _breaker_open():
+        return {
+            "success": False,
+            "error": "AssemblyAI temporarily unavailable",
+            "fallback": _fallback_analysis(text),
+        }
+
     try:
-        async with aiohttp.ClientSession() as session:
-            # Use LeMUR task endpoint for text analysis
-            payload = {
-                "prompt": (
-                    f"Analyze the following marketing content and provide:\n"
-                    f"1. Overall sentiment (positive/neutral/negative)\n"
-                    f"2. Key themes (list of 3-5 keywords)\n"
-                    f"3. Engagement prediction (low/medium/high)\n"
-                    f"4. One improvement suggestion\n\n"
-                    f"Content: {text}\n\n"
-                    f"Respond in JSON format with keys: sentiment, themes, engagement, suggestion"
-                ),
-                "final_model": "default",
-            }
-            async with session.post(
-                f"{BASE_URL}/lemur/v3/generate/task",
-                json=payload,
-                headers=HEADERS,
-                timeout=aiohttp.ClientTimeout(total=15),
-            ) as resp:
-                if resp.status == 200:
-                    data = await resp.json()
-                    return {
-                        "success": True,
-                        "analysis": data.get("response", ""),
-                        "request_id": data.get("request_id", ""),
-                    }
-                else:
-                    error_text = await resp.text()
-                    logger.warning(f"AssemblyAI returned {resp.status}: {error_text}")
+        session = await _get_session()
+        # Use LeMUR task endpoint for text analysis
+        payload = {
+            "prompt": _LEMUR_PROMPT_PREFIX + text + _LEMUR_PROMPT_SUFFIX,
+            "final_model": "default",
+        }
+        async with session.post(
+            f"{BASE_URL}/lemur/v3/generate/task",
+            json=payload,
+            timeout=LEMUR_TIMEOUT,
+        ) as resp:
+            # Server errors count against the breaker; client errors are about the request
+            _record_call(resp.status < 500)
+            if resp.status == 200:
+                data = await resp.json(loads=_json_loads)
+                analysis = _parse_analysis(data.get("response"))
+                if analysis is None:
+                    logger.warning("AssemblyAI returned an analysis that is not the requested JSON object")
                     return {
                         "success": False,
-                        "error": f"AssemblyAI API error: {resp.status}",
+                        "error": "Malformed AssemblyAI analysis",
                         "fallback": _fallback_analysis(text),
                     }
+                result = {
+                    "success": True,
+                    "analysis": analysis,
+                    "request_id": data.get("request_id", ""),
+                    "cached": False,
+                }
+                _cache_analysis(cache_key, result)
+                return result
+            else:
+                error_text = await resp.text()
+                logger.warning(f"AssemblyAI returned {resp.status}: {error_text}")
+                return {
+                    "success": False,
+                    "error": f"AssemblyAI API error: {resp.status}",
+                    "fallback": _fallback_analysis(text),
+                }
     except Exception as e:
+        _record_call(False)
         logger.error(f"AssemblyAI request failed: {e}")
         return {
             "success": False,
@@ -67,65 +227,190 @@ async def analyze_text(text: str) -> Dict[str, Any]:
         }
 
 
-async def transcribe_audio(audio_url: str) -> Dict[str, Any]:
+# Concurrent LeMUR requests per analyze_text_batch call
+ANALYZE_BATCH_CONCURRENCY = 16
+
+
+async def analyze_text_batch(texts: List[str]) -> List[Dict[str, Any]]:
+    """
+    Analyze many texts concurrently over the shared session, in input order.
+    Duplicate texts in the batch are analyzed once.
+    """
+    semaphore = asyncio.Semaphore(ANALYZE_BATCH_CONCURRENCY)
+
+    async def _analyze(text: str) -> Dict[str, Any]:
+        async with semaphore:
+            return await analyze_text(text)
+
+    unique = list(dict.fromkeys(texts))
+    results = await asyncio.gather(*(_analyze(text) for text in unique))
+    by_text = dict(zip(unique, results))
+    return [by_text[text] for text in texts]
+
+
+async def transcribe_audio(audio_url: str, webhook_url: Optional[str] = None) -> Dict[str, Any]:
     """
     Transcribe audio from URL using AssemblyAI.
     Useful for analyzing voice-based marketing content.
+    With webhook_url, AssemblyAI notifies that URL when the transcript is done.
     """
+    if _breaker_open():
+        return {"success": False, "error": "AssemblyAI temporarily unavailable"}
+
     try:
-        async with aiohttp.ClientSession() as session:
-            payload = {
-                "audio_url": audio_url,
-                "sentiment_analysis": True,
-                "entity_detection": True,
-                "auto_highlights": True,
-            }
-            async with session.post(
-                f"{BASE_URL}/transcript",
-                json=payload,
-                headers=HEADERS,
-                timeout=aiohttp.ClientTimeout(total=10),
-            ) as resp:
-                if resp.status == 200:
-                    data = await resp.json()
-                    return {"success": True, "transcript_id": data.get("id"), "status": data.get("status")}
-                else:
-                    return {"success": False, "error": f"Status {resp.status}"}
+        session = await _get_session()
+        payload = {
+            "audio_url": audio_url,
+            "sentiment_analysis": True,
+            "entity_detection": True,
+            "auto_highlights": True,
+        }
+        if webhook_url:
+            payload["webhook_url"] = webhook_url
+        async with session.post(
+            f"{BASE_URL}/transcript",
+            json=payload,
+            timeout=SUBMIT_TIMEOUT,
+        ) as resp:
+            _record_call(resp.status < 500)
+            if resp.status == 200:
+                data = await resp.json(loads=_json_loads)
+                return {"success": True, "transcript_id": data.get("id"), "status": data.get("status")}
+            else:
+                return {"success": False, "error": f"Status {resp.status}"}
     except Exception as e:
+        _record_call(False)
         logger.error(f"AssemblyAI transcribe failed: {e}")
         return {"success": False, "error": str(e)}
 
 
 async def get_transcript(transcript_id: str) -> Dict[str, Any]:
-    """Poll for transcript result."""
+    """
+    Poll for transcript result.
+    Failed polls carry "retryable": True only for outages (timeouts, connection errors, 5xx).
+    """
+    if _breaker_open():
+        return {"success": False, "error": "AssemblyAI temporarily unavailable", "retryable": True}
+
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(
-                f"{BASE_URL}/transcript/{transcript_id}",
-                headers=HEADERS,
-                timeout=aiohttp.ClientTimeout(total=10),
-            ) as resp:
-                if resp.status == 200:
-                    data = await resp.json()
-                    return {
-                        "success": True,
-                        "status": data.get("status"),
-                        "text": data.get("text"),
-                        "sentiment_analysis_results": data.get("sentiment_analysis_results"),
-                        "auto_highlights_result": data.get("auto_highlights_result"),
-                    }
-                else:
-                    return {"success": False, "error": f"Status {resp.status}"}
+        session = await _get_session()
+        async with session.get(
+            f"{BASE_URL}/transcript/{transcript_id}",
+            timeout=POLL_TIMEOUT,
+        ) as resp:
+            _record_call(resp.status < 500)
+            if resp.status == 200:
+                # Parse the raw bytes once; skips decoding the whole transcript into a str first
+                data = _json_loads(await resp.read())
+                return {
+                    "success": True,
+                    "status": data.get("status"),
+                    "text": data.get("text"),
+                    "sentiment_analysis_results": data.get("sentiment_analysis_results"),
+                    "auto_highlights_result": data.get("auto_highlights_result"),
+                    "error": data.get("error"),
+                }
+            else:
+                return {"success": False, "error": f"Status {resp.status}", "retryable": resp.status >= 500}
     except Exception as e:
-        return {"success": False, "error": str(e)}
+        _record_call(False)
+        return {"success": False, "error": str(e), "retryable": True}
+
+
+# Transcript polling starts at this interval and doubles up to the cap (seconds)
+POLL_INITIAL_DELAY = 1.0
+POLL_MAX_DELAY = 30.0
+
+# Transcript statuses that are still worth polling for
+_PENDING_STATUSES = ("queued", "processing")
+
+
+async def await_transcript(transcript_id: str, max_wait: float = 600) -> Dict[str, Any]:
+    """
+    Poll until a transcript is completed or has failed, backing off between polls.
+    Returns the last poll result, or an error result once max_wait seconds have passed.
+    Client errors (bad key, unknown id) return at once instead of polling until max_wait.
+    """
+    deadline = time.monotonic() + max_wait
+    delay = POLL_INITIAL_DELAY
+    while True:
+        result = await get_transcript(transcript_id)
+        # Keep polling only while the transcript is pending or the API is having an outage
+        if result.get("success"):
+            if result.get("status") not in _PENDING_STATUSES:
+                return result
+        elif not result.get("retryable"):
+            return result
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return {
+                "success": False,
+                "status": result.get("status"),
+                "error": f"Transcript {transcript_id} not ready after {max_wait}s",
+            }
+
+        # Jitter keeps concurrent pollers from waking in lockstep
+        await asyncio.sleep(min(delay + random.uniform(0, 0.25 * delay), remaining))
+        delay = min(delay * 2, POLL_MAX_DELAY)
+
+
+# analyze_audio calls waiting for a webhook notification: transcript_id -> future
+_transcript_waiters: Dict[str, asyncio.Future] = {}
+
+
+async def analyze_audio(
+    audio_url: str, webhook_url: Optional[str] = None, max_wait: float = 600
+) -> Dict[str, Any]:
+    """
+    Submit audio and wait for the finished transcript.
+    With webhook_url, notify_transcript_ready ends the wait early; backoff polling runs
+    alongside it, so a webhook that never arrives doesn't stall the call until max_wait.
+    """
+    submitted = await transcribe_audio(audio_url, webhook_url=webhook_url)
+    if not submitted.get("success"):
+        return submitted
+
+    transcript_id = submitted["transcript_id"]
+    if not webhook_url:
+        return await await_transcript(transcript_id, max_wait)
+
+    waiter = asyncio.get_running_loop().create_future()
+    _transcript_waiters[transcript_id] = waiter
+    poller = asyncio.ensure_future(await_transcript(transcript_id, max_wait))
+    try:
+        await asyncio.wait((waiter, poller), return_when=asyncio.FIRST_COMPLETED)
+        if poller.done():
+            return poller.result()
+        return await get_transcript(transcript_id)
+    finally:
+        poller.cancel()
+        _transcript_waiters.pop(transcript_id, None)
+
+
+def notify_transcript_ready(transcript_id: str, status: str) -> bool:
+    """
+    Resolve a pending analyze_audio call from an AssemblyAI webhook payload.
+    Returns False when no call is waiting for this transcript.
+    """
+    waiter = _transcript_waiters.get(transcript_id)
+    if waiter is None or waiter.done():
+        return False
+    waiter.set_result(status)
+    return True
+
+
+# Call-to-action phrases recognised by the offline fallback, matched in one scan
+_CTA_KEYWORDS = ("click", "buy", "sign up", "subscribe", "link", "shop")
+_CTA_RE = re.compile("|".join(map(re.escape, _CTA_KEYWORDS)), re.IGNORECASE)
 
 
 def _fallback_analysis(text: str) -> Dict[str, Any]:
     """Simple fallback analysis when API is unavailable."""
     word_count = len(text.split())
     has_question = "?" in text
-    has_emoji = any(ord(c) > 127 for c in text)
-    has_cta = any(w in text.lower() for w in ["click", "buy", "sign up", "subscribe", "link", "shop"])
+    has_emoji = not text.isascii()
+    has_cta = _CTA_RE.search(text) is not None
 
     engagement = "high" if (has_question and has_emoji) else "medium" if (has_question or has_emoji) else "low"
 
@@ -142,16 +427,15 @@ def _fallback_analysis(text: str) -> Dict[str, Any]:
 async def health_check() -> Dict[str, Any]:
     """Check AssemblyAI connectivity."""
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(
-                f"{BASE_URL}/transcript",
-                headers=HEADERS,
-                timeout=aiohttp.ClientTimeout(total=5),
-            ) as resp:
-                return {
-                    "status": "healthy" if resp.status in (200, 401, 422) else "unhealthy",
-                    "api_key_configured": bool(ASSEMBLY_AI_KEY),
-                    "status_code": resp.status,
-                }
+        session = await _get_session()
+        async with session.get(
+            f"{BASE_URL}/transcript",
+            timeout=HEALTH_TIMEOUT,
+        ) as resp:
+            return {
+                "status": "healthy" if resp.status in (200, 401, 422) else "unhealthy",
+                "api_key_configured": bool(ASSEMBLY_AI_KEY),
+                "status_code": resp.status,
+            }
     except Exception as e:
         return {"status": "unhealthy", "error": str(e)}
@@ -4,19 +4,25 @@ Comprehensive AI service usage and cost tracking with budget management and anal
 Designed according to AI Service Layer specifications
 """
 
-from typing import Dict, Any, Optional, List, Union, Tuple
+from typing import Dict, Any, List, Tuple
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from dataclasses import dataclass, field
 from enum import Enum
-import asyncio
-import json
 import logging
+import time
 
-from core.config import settings
 from core.errors import RateLimitError
 
 logger = logging.getLogger(__name__)
 
+# Prompt tokens served from the provider's prefix cache are billed at a discount
+CACHED_INPUT_PRICE_FACTOR = 0.5
+
+# Usage analytics are polled by dashboards; keep recent results per (business, days) briefly
+ANALYTICS_CACHE_TTL_SECONDS = 30
+ANALYTICS_CACHE_SIZE = 1024
+
 # Define missing error class
 class BudgetExceededError(Exception):
     """Budget exceeded error"""
@@ -30,6 +36,7 @@ class AIResponse:
     input_tokens: int
     output_tokens: int
     tokens_used: int
+    cached_tokens: int = 0
 
 class SubscriptionTier(str, Enum):
     """Subscription tier levels"""
@@ -63,6 +70,7 @@ class EnhancedCostTracker:
     
     def __init__(self):
         self.pricing = self._initialize_pricing()
+        self.token_rates = self._initialize_token_rates()
         self.daily_limits = self._initialize_daily_limits()
         self.usage_cache: Dict[str, Dict] = {}  # business_id -> usage data
         self.budget_alerts: Dict[str, List[BudgetAlert]] = {}
@@ -71,9 +79,9 @@ class EnhancedCostTracker:
         # Real-time tracking
         self.active_sessions: Dict[str, Dict] = {}  # session_id -> session data
         
-        # Analytics cache
-        self.analytics_cache: Dict[str, Dict] = {}
-        self.cache_ttl = 300  # 5 minutes
+        # Analytics cache: (business_id, days) -> (expires_at, data), LRU bounded
+        self.analytics_cache: "OrderedDict[Tuple[str, int], Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self.cache_ttl = ANALYTICS_CACHE_TTL_SECONDS
     
     def _initialize_pricing(self) -> Dict[str, Dict[str, float]]:
         """Initialize comprehensive pricing for different AI models"""
@@ -100,6 +108,17 @@ class EnhancedCostTracker:
             }
         }
     
+    def _initialize_token_rates(self) -> Dict[str, Tuple[float, float, float]]:
+        """Precompute per-token (input, output, cached input) rates from the per-1K pricing"""
+        return {
+            model: (
+                pricing["input"] / 1000.0,
+                pricing["output"] / 1000.0,
+                pricing["input"] / 1000.0 * CACHED_INPUT_PRICE_FACTOR
+            )
+            for model, pricing in self.pricing.items()
+        }
+    
     def _initialize_daily_limits(self) -> Dict[str, Dict[str, Any]]:
         """Initialize tier-based daily usage limits"""
         return {
@@ -131,17 +150,20 @@ class EnhancedCostTracker:
         try:
             model = response.model.lower()
             
-            # Get pricing for model
-            if model not in self.pricing:
+            # Get per-token rates for model
+            rates = self.token_rates.get(model)
+            if rates is None:
                 logger.warning(f"Unknown model {model}, using default GPT-3.5 pricing")
-                model = "gpt-3.5-turbo"
-            
-            pricing = self.pricing[model]
-            
-            # Calculate token costs
-            input_cost = (response.input_tokens / 1000.0) * pricing["input"]
-            output_cost = (response.output_tokens / 1000.0) * pricing["output"]
-            total_cost = input_cost + output_cost
+                rates = self.token_rates["gpt-3.5-turbo"]
+            
+            # Calculate token costs, discounting prompt tokens served from cache
+            input_rate, output_rate, cached_rate = rates
+            cached_tokens = min(response.cached_tokens, response.input_tokens)
+            total_cost = (
+                (response.input_tokens - cached_tokens) * input_rate
+                + cached_tokens * cached_rate
+                + response.output_tokens * output_rate
+            )
             
             logger.debug(f"Cost calculation: {response.input_tokens} input + {response.output_tokens} output = ${total_cost:.6f}")
             
@@ -223,6 +245,15 @@ class EnhancedCostTracker:
             logger.error(f"Usage tracking failed for {business_id}: {str(e)}")
             return {"success": False, "error": str(e)}
     
+    async def track_usage_bulk(self, records: List[Tuple[str, AIResponse, float, str]]) -> int:
+        """Track a batch of (business_id, response, cost, task_type) records, returning how many succeeded"""
+        tracked = 0
+        for business_id, response, cost, task_type in records:
+            result = await self.track_usage(business_id, response, cost, task_type)
+            if result.get("success"):
+                tracked += 1
+        return tracked
+    
     async def check_budget_before_request(self, business_id: str, estimated_tokens: int = 1000) -> Dict[str, Any]:
         """Check if request is within budget before processing"""
         try:
@@ -286,11 +317,11 @@ class EnhancedCostTracker:
         """Get comprehensive usage analytics for a business"""
         try:
             # Check cache first
-            cache_key = f"{business_id}_analytics_{days}"
-            if cache_key in self.analytics_cache:
-                cached = self.analytics_cache[cache_key]
-                if (datetime.now() - cached["cached_at"]).seconds < self.cache_ttl:
-                    return cached["data"]
+            cache_key = (business_id, days)
+            cached = self.analytics_cache.get(cache_key)
+            if cached is not None and cached[0] > time.monotonic():
+                self.analytics_cache.move_to_end(cache_key)
+                return cached[1]
             
             # Generate analytics
             end_date = datetime.now().date()
@@ -355,11 +386,11 @@ class EnhancedCostTracker:
             analytics["cost_efficiency"] = await self._calculate_cost_efficiency(analytics)
             analytics["recommendations"] = await self._generate_usage_recommendations(business_id, analytics)
             
-            # Cache results
-            self.analytics_cache[cache_key] = {
-                "data": analytics,
-                "cached_at": datetime.now()
-            }
+            # Cache results, evicting the least recently used entry
+            self.analytics_cache[cache_key] = (time.monotonic() + self.cache_ttl, analytics)
+            self.analytics_cache.move_to_end(cache_key)
+            if len(self.analytics_cache) > ANALYTICS_CACHE_SIZE:
+                self.analytics_cache.popitem(last=False)
             
             return analytics
             
@@ -459,19 +490,13 @@ class EnhancedCostTracker:
     
     async def _estimate_request_cost(self, estimated_tokens: int, model: str = "gpt-3.5-turbo") -> float:
         """Estimate cost for a request"""
-        if model not in self.pricing:
-            model = "gpt-3.5-turbo"
-        
-        pricing = self.pricing[model]
+        input_rate, output_rate, _ = self.token_rates.get(model) or self.token_rates["gpt-3.5-turbo"]
         
         # Estimate input/output token split (rough approximation)
         input_tokens = int(estimated_tokens * 0.7)
         output_tokens = int(estimated_tokens * 0.3)
         
-        input_cost = (input_tokens / 1000.0) * pricing["input"]
-        output_cost = (output_tokens / 1000.0) * pricing["output"]
-        
-        return round(input_cost + output_cost, 6)
+        return round(input_tokens * input_rate + output_tokens * output_rate, 6)
     
     async def _get_remaining_budget(self, business_id: str) -> Dict[str, float]:
         """Get remaining budget for a business"""
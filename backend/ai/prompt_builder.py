@@ -3,10 +3,27 @@ Prompt Builder Module
 Builds and manages prompts for AI services
 """
 
-from typing import Dict, Any, Optional, List
-from datetime import datetime
-from core.config import settings
+from typing import Dict, Any, Optional, List, Tuple
+from collections import OrderedDict
 import json
+import string
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+
+def _json_dumps_indented(obj: Any) -> str:
+    """Serialize to two-space indented JSON, using orjson when available"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(obj, default=str, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS).decode()
+    return json.dumps(obj, indent=2, default=str)
+
+
+# Built prompts kept per template and variable values (LRU)
+PROMPT_CACHE_SIZE = 4096
 
 class PromptBuilder:
     """Prompt builder for AI services"""
@@ -14,6 +31,8 @@ class PromptBuilder:
     def __init__(self):
         self.system_prompts = self._initialize_system_prompts()
         self.prompt_templates = self._initialize_prompt_templates()
+        self._compiled_templates = self._compile_templates()
+        self._prompt_cache: "OrderedDict[Tuple[Any, ...], str]" = OrderedDict()
     
     def _initialize_system_prompts(self) -> Dict[str, str]:
         """Initialize system prompts for different AI services"""
@@ -510,33 +529,78 @@ Return valid JSON with the following structure:
             }
         }
     
+    def _compile_templates(self) -> Dict[Tuple[str, str], Tuple[str, Tuple[str, ...], Tuple[str, ...]]]:
+        """Parse every template once into a system prefix, static task segments and field names"""
+        compiled = {}
+        formatter = string.Formatter()
+        
+        for service_type, templates in self.prompt_templates.items():
+            for template_name, template in templates.items():
+                segments = [""]
+                fields = []
+                for literal, field_name, _, _ in formatter.parse(template["task"]):
+                    segments[-1] += literal
+                    if field_name is not None:
+                        fields.append(field_name)
+                        segments.append("")
+                compiled[(service_type, template_name)] = (
+                    f"{template['system']}\n\n",
+                    tuple(segments),
+                    tuple(fields)
+                )
+        
+        return compiled
+    
     def build_prompt(
         self, 
         service_type: str, 
         template_name: str, 
-        variables: Dict[str, Any]
+        variables: Dict[str, Any],
+        include_system: bool = True
     ) -> str:
-        """Build a complete prompt with system prompt, context, and task"""
+        """Build a complete prompt with system prompt, context, and task
+        
+        Pass include_system=False when the system prompt is sent as its own
+        message, so it isn't repeated in the user turn.
+        """
         try:
-            # Get template
-            template = self.prompt_templates.get(service_type, {}).get(template_name)
-            if not template:
+            # Get precompiled template
+            compiled = self._compiled_templates.get((service_type, template_name))
+            if not compiled:
                 raise ValueError(f"Template not found: {service_type}.{template_name}")
             
-            # Get system prompt
-            system_prompt = template["system"]
+            # Reuse the prompt built for identical variable values; nested payloads
+            # that aren't hashable are simply built every time
+            allowed_variables = self.prompt_templates[service_type][template_name].get("variables", [])
+            cache_key = (service_type, template_name, include_system) + tuple(
+                (value.__class__, value) for value in map(variables.get, allowed_variables)
+            )
+            try:
+                prompt = self._prompt_cache.get(cache_key)
+            except TypeError:
+                cache_key = prompt = None
+            if prompt is not None:
+                self._prompt_cache.move_to_end(cache_key)
+                return prompt
             
-            # Get task template
-            task_template = template["task"]
-            
-            # Inject variables into task template
-            task_prompt = self._inject_variables(task_template, variables, template.get("variables", []))
+            system_prefix, segments, fields = compiled
+            context = self._format_context(variables, allowed_variables)
             
-            # Combine system prompt and task prompt
-            full_prompt = f"{system_prompt}\n\n{task_prompt}"
+            # Interleave static segments with formatted values in a single join
+            parts = [system_prefix, segments[0]] if include_system else [segments[0]]
+            for field_name, segment in zip(fields, segments[1:]):
+                parts.append(context[field_name])
+                parts.append(segment)
             
-            return full_prompt
+            prompt = "".join(parts)
+            if cache_key is not None:
+                self._prompt_cache[cache_key] = prompt
+                if len(self._prompt_cache) > PROMPT_CACHE_SIZE:
+                    self._prompt_cache.popitem(last=False)
+            return prompt
             
+        except KeyError as e:
+            raise ValueError(f"Failed to build prompt: Missing variable in template: {str(e)}")
         except Exception as e:
             raise ValueError(f"Failed to build prompt: {str(e)}")
     
@@ -602,7 +666,7 @@ Return valid JSON with the following structure:
             if var in variables and variables[var] is not None:
                 # Convert complex objects to JSON strings
                 if isinstance(variables[var], (dict, list)):
-                    context[var] = json.dumps(variables[var], indent=2)
+                    context[var] = _json_dumps_indented(variables[var])
                 else:
                     context[var] = str(variables[var])
             else:
@@ -691,7 +755,7 @@ Return valid JSON with the following structure:
     
     def add_json_schema(self, prompt: str, schema: Dict[str, Any]) -> str:
         """Add JSON schema requirements to prompt"""
-        schema_text = json.dumps(schema, indent=2)
+        schema_text = _json_dumps_indented(schema)
         return f"{prompt}\n\nJSON SCHEMA:\n{schema_text}\n\nIMPORTANT: Return valid JSON that matches the schema exactly."
     
     def add_brand_voice(self, prompt: str, brand_voice: str) -> str:
@@ -6,15 +6,26 @@ Designed according to AI Service Layer specifications
 
 import json
 import jsonschema
-from typing import Dict, Any, Optional, List, Union
+from typing import Dict, Any, Optional, List, Union, Callable
 from dataclasses import dataclass
 from datetime import datetime
 import logging
 
 from core.errors import ValidationError
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
+
+def _json_loads(data: Union[str, bytes]) -> Any:
+    """Parse JSON text or bytes, using orjson when available"""
+    return orjson.loads(data) if ORJSON_AVAILABLE else json.loads(data)
+
 @dataclass
 class ValidationResult:
     """Validation result with detailed feedback"""
@@ -24,12 +35,100 @@ class ValidationResult:
     warnings: List[str] = None
     validation_time: float = 0.0
 
+class StreamingValidator:
+    """Validate items of top-level object arrays as soon as each one is complete
+    
+    Feed streamed JSON text chunk by chunk. Each finished element of an array
+    property that has an item validator is parsed and checked immediately,
+    raising ValidationError on the first invalid element instead of waiting for
+    the whole document. The full document is still validated afterwards.
+    """
+    
+    def __init__(self, item_validators: Dict[str, Callable[[Any], None]]):
+        self._item_validators = item_validators
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._expect_key = False
+        self._key_parts: Optional[List[str]] = None
+        self._key: Optional[str] = None
+        self._array_key: Optional[str] = None
+        self._item_parts: Optional[List[str]] = None
+        self._item_counts: Dict[str, int] = {}
+        self.items_validated = 0
+    
+    def feed(self, chunk: str) -> None:
+        """Scan a chunk of streamed JSON, validating any array items it completes"""
+        item_from = 0
+        for i, ch in enumerate(chunk):
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._key_parts is not None:
+                        self._key = "".join(self._key_parts)
+                        self._key_parts = None
+                        continue
+                if self._key_parts is not None:
+                    self._key_parts.append(ch)
+                continue
+            
+            if ch == '"':
+                self._in_string = True
+                # Object keys of the root object name the array being streamed
+                if self._depth == 1 and self._expect_key:
+                    self._key_parts = []
+            elif ch in "{[":
+                self._depth += 1
+                if self._depth == 1:
+                    self._expect_key = ch == "{"
+                elif self._depth == 2 and ch == "[" and self._key in self._item_validators:
+                    self._array_key = self._key
+                elif self._depth == 3 and ch == "{" and self._array_key is not None:
+                    self._item_parts = []
+                    item_from = i
+            elif ch in "}]":
+                if self._depth == 3 and self._item_parts is not None:
+                    self._item_parts.append(chunk[item_from:i + 1])
+                    self._validate_item("".join(self._item_parts))
+                    self._item_parts = None
+                elif self._depth == 2:
+                    self._array_key = None
+                self._depth -= 1
+            elif self._depth == 1:
+                if ch == ",":
+                    self._expect_key = True
+                elif ch == ":":
+                    self._expect_key = False
+        
+        if self._item_parts is not None:
+            self._item_parts.append(chunk[item_from:])
+    
+    def _validate_item(self, item_text: str) -> None:
+        """Parse and validate one completed array item"""
+        key = self._array_key
+        index = self._item_counts.get(key, 0)
+        self._item_counts[key] = index + 1
+        try:
+            self._item_validators[key](_json_loads(item_text))
+        except json.JSONDecodeError as e:
+            raise ValidationError(f"Invalid JSON in {key}[{index}]: {str(e)}")
+        except jsonschema.ValidationError as e:
+            raise ValidationError(f"Invalid {key}[{index}]: {e.message}")
+        self.items_validated += 1
+
 class SchemaValidator:
     """Comprehensive JSON schema validation with error recovery"""
     
     def __init__(self):
         self.schemas = {}
+        self._compiled: Dict[str, Callable[[Any], None]] = {}
+        self._item_validators: Dict[str, Dict[str, Callable[[Any], None]]] = {}
         self._load_schemas()
+        self.precompile()
         
         # Validation statistics
         self.validation_stats = {
@@ -49,6 +148,33 @@ class SchemaValidator:
             "message_reply": self._get_message_reply_schema()
         }
 
+    def precompile(self, schema_types: Optional[List[str]] = None):
+        """Compile validators once so each validation is a single call"""
+        for schema_type in schema_types or list(self.schemas):
+            schema = self.schemas[schema_type]
+            validator_cls = jsonschema.validators.validator_for(schema)
+            validator_cls.check_schema(schema)
+            self._compiled[schema_type] = validator_cls(schema).validate
+            
+            # Item validators for top-level arrays of objects, used while streaming
+            self._item_validators[schema_type] = {
+                name: validator_cls(prop["items"]).validate
+                for name, prop in schema.get("properties", {}).items()
+                if prop.get("type") == "array" and prop.get("items", {}).get("type") == "object"
+            }
+
+    def register_schema(self, schema_type: str, schema: Dict[str, Any]):
+        """Add or replace a schema and compile its validator"""
+        self.schemas[schema_type] = schema
+        self.precompile([schema_type])
+
+    def streaming_validator(self, schema_type: str) -> Optional[StreamingValidator]:
+        """Get a fresh streaming validator, or None if the schema has no object arrays"""
+        item_validators = self._item_validators.get(schema_type)
+        if not item_validators:
+            return None
+        return StreamingValidator(item_validators)
+
     async def validate_response(self, response_content: str, schema_type: str) -> Dict[str, Any]:
         """Validate AI response against schema with error recovery"""
         start_time = datetime.now()
@@ -60,7 +186,7 @@ class SchemaValidator:
             
             # Try to parse as JSON
             try:
-                data = json.loads(response_content)
+                data = _json_loads(response_content)
             except json.JSONDecodeError:
                 # For demo mode, create a basic valid structure
                 data = {"content": response_content, "validation": "demo_mode"}
@@ -139,16 +265,17 @@ class SchemaValidator:
         """Validate AI response against expected schema"""
         try:
             # Parse JSON if response is string
-            if isinstance(response_data, str):
-                response_data = json.loads(response_data)
+            if isinstance(response_data, (str, bytes)):
+                response_data = _json_loads(response_data)
             
-            # Get validation schema for schema type
-            rules = self.schemas.get(schema_type)
-            if not rules:
+            # Get compiled validator for schema type
+            validate = self._compiled.get(schema_type)
+            if validate is None:
                 raise ValidationError(f"Unknown schema type: {schema_type}")
+            rules = self.schemas[schema_type]
             
             # Validate structure
-            self._validate_structure(response_data, rules)
+            validate(response_data)
             
             # Validate business rules
             self._validate_business_rules(response_data, rules)
@@ -175,7 +302,7 @@ class SchemaValidator:
             
             # Try to parse and validate
             try:
-                parsed_data = json.loads(json_part)
+                parsed_data = _json_loads(json_part)
                 validated_data = self.validate_response(schema_type, parsed_data)
                 return validated_data
             except Exception:
@@ -185,76 +312,6 @@ class SchemaValidator:
         except Exception as e:
             raise AIServiceError(f"Failed to repair response: {str(e)}")
     
-    def _validate_structure(self, data: Dict[str, Any], rules: Dict[str, Any]) -> None:
-        """Validate data structure according to rules"""
-        # Check required fields
-        for required_field in rules["required"]:
-            if required_field not in data:
-                raise ValidationError(f"Missing required field: {required_field}")
-        
-        # Check data types
-        for field, spec in rules["properties"].items():
-            if field in data:
-                self._validate_field(data[field], spec, field)
-        
-        # Check array types
-        for field, spec in rules["properties"].items():
-            if field in data and isinstance(data[field], list):
-                self._validate_array(data[field], spec, field)
-    
-    def _validate_field(self, value: Any, spec: Dict[str, Any], field_name: str) -> None:
-        """Validate individual field according to specification"""
-        field_type = spec.get("type")
-        
-        if field_type == "array":
-            if not isinstance(value, list):
-                raise ValidationError(f"Field {field_name} must be an array")
-        elif field_type == "object":
-            if not isinstance(value, dict):
-                raise ValidationError(f"Field {field_name} must be an object")
-        elif field_type == "string":
-            if not isinstance(value, str):
-                raise ValidationError(f"Field {field_name} must be a string")
-        elif field_type == "integer":
-            if not isinstance(value, int):
-                raise ValidationError(f"Field {field_name} must be an integer")
-        elif field_type == "number":
-            if not isinstance(value, (int, float)):
-                raise ValidationError(f"Field {field_name} must be a number")
-        elif field_type == "boolean":
-            if not isinstance(value, bool):
-                raise ValidationError(f"Field {field_name} must be a boolean")
-        
-        # Check enum values
-        if "enum" in spec:
-            if value not in spec["enum"]:
-                raise ValidationError(f"Field {field_name} must be one of: {spec['enum']}")
-        
-        # Check numeric ranges
-        if "minimum" in spec and isinstance(value, (int, float)):
-            if value < spec["minimum"]:
-                raise ValidationError(f"Field {field_name} must be at least {spec['minimum']}")
-        
-        if "maximum" in spec and isinstance(value, (int, float)):
-            if value > spec["maximum"]:
-                raise ValidationError(f"Field {field_name} must be at most {spec['maximum']}")
-        
-        # Check string length
-        if "minLength" in spec and isinstance(value, str):
-            if len(value) < spec["minLength"]:
-                raise ValidationError(f"Field {field_name} must be at least {spec['minLength']} characters")
-        
-        if "maxLength" in spec and isinstance(value, str):
-            if len(value) > spec["maxLength"]:
-                raise ValidationError(f"Field {field_name} must be at most {spec['maxLength']} characters")
-    
-    def _validate_array(self, array: List[Any], spec: Dict[str, Any], field_name: str) -> None:
-        """Validate array according to specification"""
-        item_spec = spec.get("items", {})
-        
-        for i, item in enumerate(array):
-            self._validate_field(item, item_spec, f"{field_name}[{i}]")
-    
     def _validate_business_rules(self, data: Dict[str, Any], rules: Dict[str, Any]) -> None:
         """Validate business rules specific to schema type"""
         business_rules = rules.get("business_rules", {})
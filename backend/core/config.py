@@ -34,10 +34,25 @@ class Settings(BaseSettings):
     ANTHROPIC_API_KEY: str = Field(default="", env="ANTHROPIC_API_KEY")
     DEFAULT_AI_MODEL: str = "gpt-4o-mini"
     FALLBACK_AI_MODEL: str = "gpt-3.5-turbo"
+    OPENAI_MODEL_STRATEGY: str = "gpt-4o-mini"
+    OPENAI_MODEL_CONTENT: str = "gpt-4o-mini"
     AI_TIMEOUT_SECONDS: int = 30
     AI_MAX_RETRIES: int = 3
     AI_REQUEST_DELAY: float = 0.5
+    AI_POOL_SIZE: int = 100
+    AI_HTTP2: bool = True
+    AI_MAX_CONCURRENT: int = 32
+    AI_MAX_TOKENS_PER_MIN: int = 200000
     MAX_TOKENS_PER_REQUEST: int = 4000
+    AI_RESPONSE_CACHE_SIZE: int = 1024
+    AI_CACHE_MAX_TEMPERATURE: float = 0.0
+    AI_EMBEDDING_MODEL: str = "text-embedding-3-small"
+    AI_SEMANTIC_CACHE_SIZE: int = 512
+    AI_SEMANTIC_CACHE_THRESHOLD: float = 0.92
+    AI_SEMANTIC_CACHE_MAX_TEMPERATURE: float = 0.5
+    AI_SERVICE_CACHE_SIZE: int = 512
+    AI_SERVICE_CACHE_TTL_SECONDS: int = 3600
+    AI_SERVICE_CACHE_MAX_TEMPERATURE: float = 0.5
     
     # Rate Limiting Configuration
     RATE_LIMIT_PER_MINUTE: int = 60
@@ -31,6 +31,13 @@ from slowapi.errors import RateLimitExceeded
 
 from core.config import settings
 
+# Render JSON responses with orjson when it is installed
+try:
+    import orjson  # noqa: F401 - required by ORJSONResponse
+    from fastapi.responses import ORJSONResponse as DefaultJSONResponse
+except ImportError:
+    DefaultJSONResponse = JSONResponse
+
 # Import SQLite database
 from models.database import (
     DatabaseManager as SQLiteDatabaseManager,
@@ -172,6 +179,7 @@ app = FastAPI(
     version="1.0.0",
     docs_url="/docs",
     redoc_url="/redoc",
+    default_response_class=DefaultJSONResponse,
 )
 
 # ── Middleware ───────────────────────────────────────────────────────────
@@ -0,0 +1,147 @@
+"""
+Streaming Validation Verification Script
+Tests: a malformed array item aborts a streamed generation and closes the stream
+"""
+import asyncio
+import sys
+import os
+from types import SimpleNamespace
+
+# Add backend to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+# Strategy responses split into stream deltas; the malformed one has a string "day" in its second item
+VALID_CHUNKS = [
+    '{"campaign_calendar": [',
+    '{"day": 1, "theme": "Launch"}, ',
+    '{"day": 2, "theme": "Teaser"}',
+    '], "weekly_themes": [], "content_distribution": {"instagram": 3}}',
+]
+MALFORMED_CHUNKS = [
+    '{"campaign_calendar": [',
+    '{"day": 1, "theme": "Launch"}, ',
+    '{"day": "second", "theme": "Teaser"}',
+    ', {"day": 3, "theme": "Reveal"}',
+    '], "weekly_themes": [], "content_distribution": {"instagram": 3}}',
+]
+
+
+class FakeStream:
+    """Async stream of completion chunks that records how far it was read"""
+
+    def __init__(self, pieces):
+        self.pieces = pieces
+        self.read = 0
+        self.closed = False
+
+    def __aiter__(self):
+        return self._chunks()
+
+    async def _chunks(self):
+        for piece in self.pieces:
+            self.read += 1
+            delta = SimpleNamespace(content=piece)
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)], usage=None)
+        usage = SimpleNamespace(prompt_tokens=10, completion_tokens=20, total_tokens=30, prompt_tokens_details=None)
+        yield SimpleNamespace(choices=[], usage=usage)
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeOpenAI:
+    """Stands in for AsyncOpenAI, answering every completion with a FakeStream"""
+
+    def __init__(self, pieces):
+        self.stream = FakeStream(pieces)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(
+            with_raw_response=SimpleNamespace(create=self._create)
+        ))
+
+    async def _create(self, **params):
+        assert params.get("stream"), "structured pipeline was not streamed"
+        return SimpleNamespace(headers={}, parse=lambda: self.stream)
+
+
+async def run_checks():
+    passed = 0
+    failed = 0
+
+    # ── Test 1: Import AI service ──────────────────────────────────
+    print("\n[1/3] Importing AI service...", end=" ")
+    try:
+        from ai.ai_service import ai_service, _PIPELINES
+        from core.errors import AIServiceError
+        pipeline = _PIPELINES["campaign_calendar"]
+        print("OK ✓")
+        passed += 1
+    except Exception as e:
+        print(f"FAIL ✗  → {e}")
+        failed += 1
+        print("\nCannot continue without the AI service. Aborting.")
+        return passed, failed
+
+    original_client = ai_service.ai_client.client
+    try:
+        # ── Test 2: Well-formed stream completes ───────────────────
+        print("[2/3] Well-formed stream validates and completes...", end=" ")
+        try:
+            fake = FakeOpenAI(VALID_CHUNKS)
+            ai_service.ai_client.client = fake
+            result = await ai_service._generate(pipeline, "gpt-4o-mini", "verify", {}, None)
+            assert result["success"], result
+            assert len(result["data"]["campaign_calendar"]) == 2
+            assert fake.stream.closed, "stream left open"
+            print("OK ✓")
+            passed += 1
+        except Exception as e:
+            print(f"FAIL ✗  → {e}")
+            failed += 1
+
+        # ── Test 3: Malformed item aborts the request ──────────────
+        print("[3/3] Malformed array item aborts the stream early...", end=" ")
+        try:
+            fake = FakeOpenAI(MALFORMED_CHUNKS)
+            ai_service.ai_client.client = fake
+            try:
+                await ai_service._generate(pipeline, "gpt-4o-mini", "verify", {}, None)
+            except AIServiceError as e:
+                assert "campaign_calendar[1]" in str(e), str(e)
+            else:
+                raise AssertionError("malformed stream was accepted")
+            assert fake.stream.read == 3, f"read {fake.stream.read} chunks after the bad item"
+            assert fake.stream.closed, "stream left open after abort"
+            print("OK ✓")
+            passed += 1
+        except Exception as e:
+            print(f"FAIL ✗  → {e}")
+            failed += 1
+    finally:
+        ai_service.ai_client.client = original_client
+        await ai_service.shutdown()
+
+    return passed, failed
+
+
+def main():
+    print("=" * 60)
+    print("  Streaming Validation Verification")
+    print("=" * 60)
+
+    passed, failed = asyncio.run(run_checks())
+
+    # ── Summary ────────────────────────────────────────────────────
+    print("\n" + "=" * 60)
+    total = passed + failed
+    print(f"  Results: {passed}/{total} passed, {failed} failed")
+    if failed == 0:
+        print("  ✅ Streaming validation aborts bad output early!")
+    else:
+        print("  ⚠️  Some tests failed – review output above")
+    print("=" * 60)
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)